@@ -0,0 +1,106 @@
+'''
+Load test of the pandas_db server. Starts a server on localhost with a temporary notebook in another process, then
+sends requests from several pipelining clients and reports requests per second and latency percentiles.
+
+usage: python benchmarks/load.py [--rows 10000] [--clients 8] [--requests 2000] [--depth 16] [--writes 0.1]
+'''
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pandas_db import Database, Model, ModelManager  # noqa: E402
+from pandas_db.utils import AsyncClient, Server, connect  # noqa: E402
+
+
+class Note(Model):
+    note: str
+    timestamp: float
+    page: int
+
+
+models = ModelManager(Note)
+
+
+def serve(path: str, port: int, token: str, rows: int, batch_size: int):
+    db = Database(models=models, path=path, journal=True)
+    db.migrate()
+    db.bulk_create('Note', ({'note': f'note {page}\nbody', 'timestamp': float(page), 'page': page}
+                            for page in range(1, rows + 1)))
+    db.create_index('Note', 'note')
+    db.save()
+    Server(db, port=port, batch_size=batch_size, token=token).run()
+
+
+async def run_client(port: int, token: str, rows: int, requests: int, depth: int, writes: float, latencies: list):
+    client = await AsyncClient.open(models=models, port=port, token=token)
+    pks = await client.query('Note', _fields=['pk'])
+    slots = asyncio.Semaphore(depth)
+
+    async def send():
+        async with slots:
+            position = random.randrange(rows)
+            start = time.perf_counter()
+            if random.random() < writes:
+                await client.update('Note', pks.iloc[[position]], note=f'note {position + 1}\nedited')
+            else:
+                await client.query('Note', page=position + 1)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(send() for _ in range(requests)))
+    await client.close()
+
+
+async def load(args, token: str):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(args.port, token, args.rows, args.requests, args.depth, args.writes, latencies)
+        for _ in range(args.clients)
+    ))
+    seconds = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print(f'{latencies.size} requests from {args.clients} clients in {seconds:.2f} s')
+    print(f'{latencies.size / seconds:.0f} requests/s')
+    print(f'latency p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, '
+          f'max {latencies.max():.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the pandas_db server on localhost.')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2_000, help='Requests sent by each client.')
+    parser.add_argument('--depth', type=int, default=16, help='Requests each client keeps in flight.')
+    parser.add_argument('--writes', type=float, default=0.1, help='Fraction of requests that update a note.')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    token = secrets.token_hex()
+    with tempfile.TemporaryDirectory() as path:
+        server = multiprocessing.Process(target=serve, args=(path, args.port, token, args.rows, args.batch_size))
+        server.start()
+        try:
+            while (client := connect(port=args.port, token=token)) is None:
+                assert server.is_alive(), 'The server did not start.'
+                time.sleep(0.1)
+            client.close()
+            asyncio.run(load(args, token))
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == '__main__':
+    main()
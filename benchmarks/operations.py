@@ -0,0 +1,351 @@
+'''
+Times the operations of pandas_db and nbk commands on a generated notebook and records their peak memory. The results
+are written as json and compared with the baseline of the same notebook size and storage, the run fails when an
+operation got slower or uses more memory than the tolerance allows.
+
+usage: python benchmarks/operations.py [--notes 10000] [--storage json] [--runs 3] [--output FILE] [--update]
+                                       [--tolerance 0.25] [--slack 5] [operation ...]
+'''
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import END, SPAN, generate, models, note_body  # noqa: E402
+from pandas_db import Database  # noqa: E402
+from pandas_db.utils import column_filters  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'operations_baseline.json')
+# Growth of the peak memory that is never reported, small allocations vary from run to run.
+MEMORY_SLACK = 1024 * 1024
+
+# A query for each lookup of column_filters.
+QUERIES = {
+    'f': {'note__f': 'kubectl'},
+    're': {'note__re': r'deploy\w* the'},
+    'eq': {'score': 42},
+    'ne': {'score__ne': 42},
+    'gt': {'timestamp__gt': END - 30 * 86400},
+    'lt': {'timestamp__lt': END - SPAN + 30 * 86400},
+    'ge': {'score__ge': 90},
+    'le': {'score__le': 9},
+    'max': {'timestamp__max': True},
+    'min': {'score__min': True},
+    'in': {'score__in': [1, 2, 3]},
+    'nin': {'score__nin': list(range(10, 100))},
+    'search': {'note__search': 'kubernetes deploy'},
+}
+
+# nbk commands run against a copy of the notebook, with the arguments after the notebook's path.
+NBK_COMMANDS = {
+    'view': [],
+    'query': ['?note__f=kubectl'],
+    'search': ['?note__search=kubernetes'],
+    'page': ['-p', '1'],
+    'output': ['?month__le=6', '-o', '{path}notes.jsonl'],
+}
+
+
+class Context:
+    '''
+    The notebook the operations run on, loaded once and changed by the operations that write.
+    '''
+    def __init__(self, path: str, storage: str, seed: int):
+        self.path = path
+        self.storage = storage
+        self.rng = random.Random(seed)
+        self.db = self.open()
+        self.db.migrate()
+        load(self, db=self.db)
+
+    def open(self, **kwargs) -> Database:
+        return Database(models=models, path=self.path, storage=self.storage, **{'load_cache': False, **kwargs})
+
+    def sample(self, rows: int) -> pd.DataFrame:
+        notes = self.db.Note
+        return notes.iloc[sorted(self.rng.sample(range(notes.shape[0]), min(rows, notes.shape[0])))]
+
+    def records(self, rows: int) -> list:
+        notes = self.db.Note
+        return [{'note': note_body(self.rng, 'benchmark'), 'timestamp': END + number, 'score': number % 100,
+                 'tags': ['benchmark'], 'meta': {'source': 'benchmark'},
+                 'notebook': notes.notebook.iloc[0], 'tag': notes.tag.iloc[0]} for number in range(rows)]
+
+
+def load(context: Context, db: Database = None, **kwargs):
+    # Tables are read on first access.
+    db = db or context.open(**kwargs)
+    for model in models:
+        db[model.__name__]
+    return None
+
+
+def cached_load(context: Context):
+    # Fills the cache, it is only missing on the first load after the file changed.
+    load(context, load_cache=True)
+    return lambda: load(context, load_cache=True)
+
+
+def query(operator: str):
+    return lambda context: lambda: context.db.query('Note', **QUERIES[operator]).shape[0]
+
+
+def create(context: Context):
+    records = context.records(100)
+    return lambda: len([context.db.create('Note', **record) for record in records])
+
+
+def bulk_create(context: Context):
+    records = context.records(1_000)
+    return lambda: context.db.bulk_create('Note', records).shape[0]
+
+
+def update(context: Context):
+    notes = [note for _, note in context.sample(100).groupby(level=0)]
+    return lambda: len([context.db.update('Note', note, score=int(note.score.iloc[0]) + 1) for note in notes])
+
+
+def bulk_update(context: Context):
+    notes = context.db.query('Note', score__lt=10)
+    return lambda: context.db.update('Note', notes, meta={'source': 'benchmark'}).shape[0]
+
+
+def drop(context: Context):
+    notes = context.sample(context.db.Note.shape[0] // 100)
+    return lambda: context.db.drop('Note', notes) or notes.shape[0]
+
+
+def save(context: Context):
+    context.db.update('Note', context.sample(1), score=0)
+    return lambda: context.db.save()
+
+
+def journal_save(context: Context):
+    db = context.open(journal=True, journal_limit=0)
+    db.migrate()
+    db.update('Note', db.Note.iloc[:100], score=1)
+    return lambda: db.save()
+
+
+def hydrate(context: Context):
+    return lambda: len(list(context.db.hydrate('Note', score__lt=10)))
+
+
+def migrate(context: Context):
+    # Without their schema fingerprints all fields of the tables are converted and the tables written again. Tables
+    # are migrated when they are first accessed.
+    db = context.open()
+    for model in models:
+        os.remove(db.fingerprint_path(model.__name__))
+    return lambda: db.migrate() or load(context, db=db)
+
+
+# Each operation prepares a run and returns the function that is timed. The function returns the number of rows it
+# handled, or None.
+OPERATIONS = {
+    'load': lambda context: lambda: load(context),
+    'load:cached': cached_load,
+    'migrate': migrate,
+    **{f'query:{operator}': query(operator) for operator in column_filters},
+    'hydrate': hydrate,
+    'create': create,
+    'bulk_create': bulk_create,
+    'update': update,
+    'update:bulk': bulk_update,
+    'drop': drop,
+    'save': save,
+    'save:journal': journal_save,
+}
+
+
+def measure(prepare, context: Context, runs: int, memory: bool) -> dict:
+    '''
+    Keeps the fastest of several runs, the others mostly measure disk caches and scheduling. The peak memory is
+    traced in a run of its own, tracing slows python code down.
+    '''
+    seconds = []
+    rows = None
+    for _ in range(runs):
+        run = prepare(context)
+        start = time.perf_counter()
+        rows = run()
+        seconds.append(time.perf_counter() - start)
+
+    result = {'seconds': min(seconds), 'runs': seconds, 'rows': rows}
+    if memory:
+        run = prepare(context)
+        tracemalloc.start()
+        run()
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def nbk_home(context: Context, home: str) -> str:
+    '''
+    Writes an nbk notebook with the notes of the generated one, through nbk itself.
+    '''
+    os.makedirs(home, exist_ok=True)
+    with open(os.path.join(home, 'config.json'), 'w') as config_file:
+        json.dump({'EDITOR': 'true', 'DATA_PATH': home, 'SOCKET': os.path.join(home, 'nbk.sock'),
+                   'STORAGE': context.storage}, config_file)
+    notes_file_path = os.path.join(home, 'import.jsonl')
+    context.db.export('Note', notes_file_path, _fields=['pk', 'note', 'timestamp'])
+    run_nbk(home, ['--import', notes_file_path])
+    os.remove(notes_file_path)
+    return home
+
+
+# Runs nbk and prints the peak resident memory of its process in KiB last on stderr. The ru_maxrss of a child also
+# counts the memory of the benchmark process it was forked from.
+NBK_RUNNER = '''
+import os, runpy, sys
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+    with open('/proc/self/status') as status:
+        print(next(line.split()[1] for line in status if line.startswith('VmHWM:')), file=sys.stderr)
+'''
+
+
+def run_nbk(home: str, arguments: list) -> int:
+    '''
+    Runs an nbk command and returns the peak resident memory of its process in bytes, None where /proc is missing.
+    '''
+    command = [sys.executable, os.path.join(ROOT, 'nbk.py'), *arguments]
+    memory = os.path.isfile('/proc/self/status')
+    if memory:
+        command[1:1] = ['-c', NBK_RUNNER]
+    result = subprocess.run(command, cwd=home, env={**os.environ, 'NBK_HOME': home}, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    assert result.returncode == 0, f'nbk {" ".join(arguments)} failed: {result.stderr}'
+    return int(result.stderr.split()[-1]) * 1024 if memory else None
+
+
+def measure_nbk(home: str, arguments: list, runs: int) -> dict:
+    arguments = [argument.format(path=home + os.sep) for argument in arguments]
+    seconds, peaks = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        peaks.append(run_nbk(home, arguments))
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': min(seconds), 'runs': seconds, 'rows': None,
+            'peak_bytes': None if None in peaks else max(peaks)}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack: float) -> list:
+    failures = []
+    for name, result in results.items():
+        if (base := baseline.get(name)) is None:
+            continue
+        if result['seconds'] > base['seconds'] * (1 + tolerance) + slack / 1000:
+            failures.append(f'{name} takes {result["seconds"] * 1000:.1f} ms, '
+                            f'baseline is {base["seconds"] * 1000:.1f} ms')
+        if (peak := result.get('peak_bytes')) and base.get('peak_bytes') is not None and \
+                peak > base['peak_bytes'] * (1 + tolerance) + MEMORY_SLACK:
+            failures.append(f'{name} peaks at {peak / 2 ** 20:.1f} MiB, '
+                            f'baseline is {base["peak_bytes"] / 2 ** 20:.1f} MiB')
+    return failures
+
+
+def report(name: str, result: dict):
+    rows = result['rows']
+    rate = f'{rows / result["seconds"]:12.0f} rows/s' if rows and result['seconds'] else ' ' * 19
+    peak = f'{result["peak_bytes"] / 2 ** 20:8.1f} MiB' if result.get('peak_bytes') is not None else ''
+    print(f'{name:20} {result["seconds"] * 1000:10.2f} ms {rate} {peak}')
+
+
+def selected(name: str, patterns: list) -> bool:
+    return not patterns or any(name == pattern or name.startswith(f'{pattern}:') for pattern in patterns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times pandas_db operations and nbk commands and checks for '
+                                                 'regressions.')
+    parser.add_argument('operations', nargs='*', help='Operations to run, such as query or query:f. All by default.')
+    parser.add_argument('--notes', type=int, default=10_000, help='Notes in the generated notebook.')
+    parser.add_argument('--storage', default='json', choices=['json', 'columnar', 'parquet', 'npz'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', default=False, help='Skips tracing the peak memory.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown and memory growth.')
+    parser.add_argument('--slack', type=float, default=5, help='Allowed slowdown in ms, for very fast operations.')
+    parser.add_argument('--output', help='Writes the results to this json file.')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update', action='store_true', default=False, help='Writes the results as the baseline.')
+    args = parser.parse_args()
+    assert set(QUERIES) == set(column_filters), f'Missing benchmark queries for {set(column_filters) - set(QUERIES)}'
+
+    results = {}
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        generate(os.path.join(path, 'notebook', ''), args.notes, args.seed, args.storage)
+        print(f'Generated {args.notes} notes in {time.perf_counter() - start:.2f} s')
+        context = Context(os.path.join(path, 'notebook', ''), args.storage, args.seed)
+
+        if any(selected(f'nbk:{command}', args.operations) for command in NBK_COMMANDS):
+            home = nbk_home(context, os.path.join(path, 'nbk'))
+            for command, arguments in NBK_COMMANDS.items():
+                if selected(name := f'nbk:{command}', args.operations):
+                    report(name, results.setdefault(name, measure_nbk(home, arguments, args.runs)))
+
+        # Operations that change the notebook run last.
+        for name, prepare in OPERATIONS.items():
+            if selected(name, args.operations):
+                report(name, results.setdefault(name, measure(prepare, context, args.runs, not args.no_memory)))
+
+    size = f'{args.notes}:{args.storage}'
+    output = {
+        'notes': args.notes,
+        'storage': args.storage,
+        'seed': args.seed,
+        'runs': args.runs,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=4)
+            output_file.write('\n')
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if args.update:
+        entries = {name: {'seconds': result['seconds'], 'peak_bytes': result.get('peak_bytes')}
+                   for name, result in results.items()}
+        baseline[size] = {**baseline.get(size, {}), **entries}
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=4)
+            baseline_file.write('\n')
+        return
+
+    failures = compare(results, baseline.get(size, {}), args.tolerance, args.slack)
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''
+Measures the import time of pandas_db with python -X importtime and fails when it regressed against the baseline.
+
+usage: python benchmarks/startup.py [--update] [--tolerance 0.25] [--slack 5] [--runs 5] [--top 15] [module ...]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'startup_baseline.json')
+DEFAULT_MODULES = ['pandas_db', 'pandas_db.utils', 'pandas_db.database']
+
+# Modules only some commands need, they must never be imported at startup.
+DEFERRED_MODULES = ['IPython', 'pyperclip', 'tabulate', 'pyarrow.parquet']
+
+
+def import_times(module: str) -> dict:
+    '''
+    Imports module in a fresh interpreter and returns the self and cumulative microseconds of every module imported.
+    '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_time), int(cumulative_time))
+    return times
+
+
+def measure(module: str, runs: int) -> dict:
+    '''
+    Keeps the fastest of several runs, the others mostly measure disk caches and scheduling.
+    '''
+    return min((import_times(module) for _ in range(runs)), key=lambda times: times[module][1])
+
+
+def report(module: str, times: dict, top: int):
+    print(f'{module}: {times[module][1] / 1000:.1f} ms')
+    for name, (self_time, cumulative_time) in sorted(times.items(), key=lambda item: -item[1][1])[:top]:
+        print(f'    {cumulative_time / 1000:8.1f} ms {self_time / 1000:8.1f} ms self  {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reports the import time of pandas_db and checks for regressions.')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest modules listed per import.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline.')
+    parser.add_argument('--slack', type=float, default=5, help='Allowed slowdown in ms, for very fast imports.')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update', action='store_true', default=False, help='Writes the results as the baseline.')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    failures = []
+    for module in args.modules:
+        times = measure(module, args.runs)
+        results[module] = times[module][1]
+        report(module, times, args.top)
+
+        if deferred := [name for name in DEFERRED_MODULES if name in times]:
+            failures.append(f'{module} imports {", ".join(deferred)} at startup')
+        if module in baseline and results[module] > baseline[module] * (1 + args.tolerance) + args.slack * 1000:
+            failures.append(f'{module} takes {results[module] / 1000:.1f} ms, '
+                            f'baseline is {baseline[module] / 1000:.1f} ms')
+
+    if args.update:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({**baseline, **results}, baseline_file, indent=4)
+            baseline_file.write('\n')
+        return
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+'''
+Generates a synthetic notebook for the benchmarks: notes with markdown bodies in notebooks and tagged, linked to both
+by foreign keys and with list and dict fields. The same seed always generates the same notes, only their pks differ.
+
+usage: python benchmarks/synthetic.py PATH [--notes 10000] [--seed 0] [--storage json]
+'''
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pandas_db import Database, Model, ModelManager  # noqa: E402
+
+WORDS = '''
+the a to of and in is for on that with it this be are as at from by or not have we can will an if use run deploy
+build test fix bug release server client query table index cache note page meeting review plan design api data user
+config docker kubernetes pod service cluster python pandas numpy script shell git branch merge commit push pull issue
+ticket sprint backlog todo done blocked error log trace metric alert latency memory disk network database schema
+migration backup restore report invoice budget call email follow up idea draft summary decision owner deadline
+'''.split()
+
+CODE_SNIPPETS = [
+    ['```bash', 'kubectl get pods -n {word}', 'kubectl logs -f deployment/{word}', '```'],
+    ['```python', 'import pandas as pd', 'df = pd.read_csv("{word}.csv")', 'print(df.describe())', '```'],
+    ['```sql', 'SELECT * FROM {word} WHERE created_at > now() - interval \'1 day\';', '```'],
+    ['```bash', 'git checkout -b {word}', 'git commit -am "{word}"', 'git push origin {word}', '```'],
+    ['```bash', 'docker compose up -d {word}', 'docker compose logs -f {word}', '```'],
+]
+
+# The n-th word comes up about 1/n as often as the first, like in real text.
+WORD_WEIGHTS = np.cumsum(1 / np.arange(1, len(WORDS) + 1)).tolist()
+
+# Two years of notes, the last one written at the start of 2026.
+END = 1767225600.0
+SPAN = 2 * 365 * 86400
+
+
+class Tag(Model):
+    name: str
+    color: str
+
+
+class Notebook(Model):
+    name: str
+    tags: list[str]
+    settings: dict[str, str]
+
+
+class Note(Model):
+    note: str
+    timestamp: float
+    score: int
+    tags: list[str]
+    meta: dict[str, str]
+    notebook: Notebook
+    tag: Tag
+    page: int
+
+    _ordinal = 'page'
+    _archive_by = 'timestamp'
+    _compressed = ('note',)
+
+
+models = ModelManager(Tag, Notebook, Note)
+
+
+def words(rng: random.Random, count: int) -> str:
+    return ' '.join(rng.choices(WORDS, cum_weights=WORD_WEIGHTS, k=count))
+
+
+def note_body(rng: random.Random, title: str) -> str:
+    lines = [f'# {title}', '']
+    for _ in range(rng.randrange(1, 5)):
+        kind = rng.random()
+        if kind < 0.4:
+            lines += [words(rng, rng.randrange(8, 40)).capitalize() + '.', '']
+        elif kind < 0.7:
+            lines += [f'- [{rng.choice(" x")}] {words(rng, rng.randrange(3, 9))}' for _ in range(rng.randrange(2, 6))]
+            lines.append('')
+        else:
+            word = rng.choice(WORDS)
+            lines += [line.format(word=word) for line in rng.choice(CODE_SNIPPETS)] + ['']
+    return '\n'.join(lines)
+
+
+def generate(path: str, notes: int = 10_000, seed: int = 0, storage: str = 'json') -> Database:
+    '''
+    Writes a notebook of the given number of notes to path and returns its database.
+    '''
+    rng = random.Random(seed)
+    numbers = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+    db = Database(models=models, path=path, storage=storage, load_cache=False)
+    db.migrate()
+
+    tags = db.bulk_create('Tag', ({'name': name, 'color': rng.choice(['red', 'green', 'blue'])}
+                                  for name in sorted(set(WORDS))[:50]))
+    notebooks = db.bulk_create('Notebook', ({
+        'name': f'notebook {number}',
+        'tags': rng.sample(WORDS, 3),
+        'settings': {'sort': rng.choice(['page', 'timestamp']), 'view': rng.choice(['list', 'table'])},
+    } for number in range(20)))
+
+    timestamps = np.sort(END - numbers.uniform(0, SPAN, notes))
+    scores = numbers.integers(0, 100, notes)
+    tag_pks, notebook_pks = tags.pk.tolist(), notebooks.pk.tolist()
+    db.bulk_create('Note', ({
+        'note': note_body(rng, words(rng, rng.randrange(2, 6)).capitalize()),
+        'timestamp': float(timestamps[number]),
+        'score': int(scores[number]),
+        'tags': rng.sample(WORDS, rng.randrange(0, 4)),
+        'meta': {'source': rng.choice(['cli', 'import', 'shell']), 'lang': rng.choice(['en', 'de'])},
+        'notebook': rng.choice(notebook_pks),
+        'tag': rng.choice(tag_pks) if rng.random() < 0.8 else None,
+    } for number in range(notes)))
+    db.save()
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Writes a synthetic notebook for the benchmarks.')
+    parser.add_argument('path')
+    parser.add_argument('--notes', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--storage', default='json', choices=['json', 'columnar', 'parquet', 'npz'])
+    args = parser.parse_args()
+    generate(args.path, args.notes, args.seed, args.storage)
+
+
+if __name__ == '__main__':
+    main()
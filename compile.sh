@@ -1 +1 @@
-pyinstaller nbk.py --workpath build/ --clean --onefile --name "nbk";
+pyinstaller nbk.py --workpath build/ --clean --onefile --name "nbk" --hidden-import tabulate;
@@ -1,20 +1,26 @@
 from datetime import datetime, timedelta
+from time import perf_counter
 import os
+import re
 import argparse
-import IPython
 import json
 from uuid import uuid4
 
-from pandas_db import Model, ModelManager, Database
-from pandas_db.utils import is_numeric
+from dateutil.tz import gettz
+import pandas as pd
 
-from pyperclip import copy
-import tabulate   # imported only to be included when compiled.
+from pandas_db import computed, Model, ModelManager, Database
+from pandas_db.utils import connect, Schema, STREAM_FORMATS
 
-USER = os.getlogin()
-CONFIG_DIR = f'/home/{USER}/nbk/'
+# IPython and pyperclip are slow to import, they are imported by the commands that use them. tabulate is imported
+# by pandas when rendering and is included in the compiled build by compile.sh.
+
+# NBK_HOME points nbk at another notebook, such as the generated ones of benchmarks/operations.py.
+CONFIG_DIR = os.path.join(os.environ['NBK_HOME'], '') if os.environ.get('NBK_HOME') else f'/home/{os.getlogin()}/nbk/'
 CONFIG_FILE = f'{CONFIG_DIR}config.json'
 DEFAULT_CONFIG = {'EDITOR': 'vim'}
+# Query values converted to numbers, words such as inf and nan are kept as text.
+NUMERIC_VALUE = re.compile(r'-?\d+(\.\d+)?')
 
 global config
 
@@ -32,14 +38,20 @@ with open(CONFIG_FILE) as json_config_file:
 if config.get('DATA_PATH') is None:
     config['DATA_PATH'] = CONFIG_DIR
 
+if config.get('ARCHIVE_PATH') is None:
+    config['ARCHIVE_PATH'] = os.path.join(config['DATA_PATH'], 'archive/')
+
+if config.get('SOCKET') is None:
+    config['SOCKET'] = f'{CONFIG_DIR}nbk.sock'
+
 TODAY = datetime.now()
 
 parser = argparse.ArgumentParser(description='Simple terminal notes organizer and utility system.')
 
 parser.add_argument('query', type=str, default='', nargs='?', help='''
 Syntax: ?<fieldName>__<optional__function>=<value>
-Main query string. Fields: [note, timestamp, page, title, year, month, day, weekday, hour]
-Common optional functions: [f, gt, lt, gte, lte]
+Main query string. Fields: [pk, note, timestamp, page, title, year, month, day, weekday, hour]
+Common optional functions: [f, search, gt, lt, gte, lte]
 values can be numerical or strings, however only numerical values are supported in greater than and less than lookups.
 Multiple lookups are supported and can be seperated by <?> or <&>.
 example: ?title__f=test&month__gte=8
@@ -57,6 +69,13 @@ Update: Executes the query and if the result is a single note, open it in the ed
 parser.add_argument('-d', '--drop', action='store_true', default=False, help='''
 Drop: Executes the query, asks for confirmation, then removes all queried pages.
     ''')
+parser.add_argument('--archive', action='store_true', default=False, help='''
+Archive: Executes the query, asks for confirmation, then moves all queried pages to the compressed archive. Archived
+notes are kept by month and no longer slow down the notebook.
+    ''')
+parser.add_argument('--include-archive', action='store_true', default=False, help='''
+Include archive: Also looks for the notes of the query in the archive. Only the months the query can match are read.
+    ''')
 parser.add_argument('-s', '--snippet', help='''
 Snippit: Executes the query and looks for a single note with a code snippet containig code wrapped in <```>.
 Then takes arguments seperated by <;>. Those arguments are formatted into the snippet at curly braces with an index.
@@ -65,6 +84,9 @@ Then takes arguments seperated by <;>. Those arguments are formatted into the sn
 parser.add_argument('-p', '--page', type=int, help='''
 Page: Shortcut to execute the query [?page=n] where `n` is the page number.
     ''')
+parser.add_argument('-i', '--id', type=str, help='''
+Id: Shortcut to execute the query [?pk=id]. Unlike page numbers, ids never change.
+    ''')
 parser.add_argument('-e', '--execute', help='''
 Execute: same as snippet but will execute the code as a bash script instead of copying it to the clipboard.
     ''')
@@ -73,51 +95,73 @@ Shell: Open an iPython shell where the database can be accessed through the glob
     ''')
 
 parser.add_argument('-o', '--output', type=str, help='''
-Output: Output file location for csv export of query.
+Output: Output file location for the export of the query. The format is taken from the extension, one of .csv, .jsonl
+or .parquet, and is csv otherwise.
+    ''')
+parser.add_argument('--import', dest='import_path', type=str, help='''
+Import: Adds the notes of a .csv, .jsonl or .parquet file written by --output. Notes already in the notebook are
+skipped.
+    ''')
+parser.add_argument('--daemon', action='store_true', default=False, help='''
+Daemon: Keeps the notebook loaded and serves the other nbk commands over a Unix socket until interrupted.
+Commands use the daemon when it is running and open the notebook themselves otherwise.
+    ''')
+parser.add_argument('--convert', type=str, choices=['json', 'columnar', 'parquet', 'npz'], help='''
+Convert: Rewrites the notebook in another storage format and uses it from then on.
     ''')
 
 
 args = parser.parse_args()
 
 
+# The local timezone file. pandas converts with its transition table at once, tzlocal() is converted row by row.
+LOCAL_TIMEZONE = gettz()
+
+
+def local_datetimes(timestamps: pd.Series) -> pd.Series:
+    return pd.to_datetime(timestamps, unit='s', utc=True).dt.tz_convert(LOCAL_TIMEZONE)
+
+
 class Note(Model):
     note: str
     timestamp: float
     page: int
 
+    # Pages number the notes in the order they were written and close up when notes are deleted.
+    _ordinal = 'page'
+    # Archived notes are kept by the month they were written.
+    _archive_by = 'timestamp'
+    # Note bodies are most of the notebook, the columnar storages compress them.
+    _compressed = ('note',)
+
     @classmethod
     def _get_field(cls, field_partial: str) -> str:
-        return next(filter(lambda field_name: field_partial in field_name, cls()._schema.fields()), None)
+        return next(filter(lambda field_name: field_partial in field_name, Schema.of(cls).fields()), None)
 
     @property
     def title(self) -> str:
         return next(iter(self.note.split('\n')), '')
 
-    @property
-    def year(self) -> int:
-        return datetime.fromtimestamp(self.timestamp).year
-
-    @property
-    def month(self) -> int:
-        return datetime.fromtimestamp(self.timestamp).month
-
-    @property
-    def day(self) -> int:
-        return datetime.fromtimestamp(self.timestamp).day
-
-    @property
-    def weekday(self) -> int:
-        return datetime.fromtimestamp(self.timestamp).weekday()
-
-    @property
-    def hour(self) -> int:
-        return datetime.fromtimestamp(self.timestamp).hour
+    @computed('timestamp', year=int, month=int, day=int, weekday=int, hour=int)
+    def _date(df):
+        dates = local_datetimes(df.timestamp)
+        return pd.DataFrame({'year': dates.dt.year, 'month': dates.dt.month, 'day': dates.dt.day,
+                             'weekday': dates.dt.weekday, 'hour': dates.dt.hour})
 
 
 models = ModelManager(Note)
-db = Database(models=models, path=config['DATA_PATH'])
-db.load()
-db.migrate()
+db = None if args.daemon else connect(config['SOCKET'], models)
+if db is None:
+    db = Database(models=models, path=config['DATA_PATH'], archive_path=config['ARCHIVE_PATH'],
+                  journal=config.get('JOURNAL', True), journal_limit=config.get('JOURNAL_LIMIT', 1_000_000),
+                  storage=config.get('STORAGE'),
+                  load_cache=config.get('LOAD_CACHE', True), query_cache=config.get('QUERY_CACHE', 0))
+    db.migrate()
+    db.create_index('Note', 'note')
+    # Building the sorted index sorts the whole column, it only pays off in the daemon and shell sessions that answer
+    # more than one query. A single command scans instead.
+    if args.daemon or args.shell:
+        db.create_index('Note', 'timestamp', 'sorted')
 
 
 def build_temp_file():
@@ -125,10 +169,13 @@ def build_temp_file():
 
 
 def output(df):
-    df.timestamp = df.timestamp.apply(lambda timestamp: str(datetime.fromtimestamp(timestamp).date()))
+    df.timestamp = local_datetimes(df.timestamp).dt.strftime('%Y-%m-%d')
     df = df.set_index('page')
     print(df[['title', 'timestamp']].to_markdown())
     if df.shape[0] == 1:
+        print(f'id: {df.pk.iloc[0]}')
+        if 'note' not in df.columns:
+            df = db.query('Note', pk=df.pk.iloc[0], _fields=['note'])
         print(df.note.iloc[0])
 
 
@@ -143,6 +190,7 @@ def get_snippet(query: str, format_value: str) -> str:
 
 
 def handle_snippet(query: str, format_value: str):
+    from pyperclip import copy
     copy(get_snippet(query, format_value))
 
 
@@ -161,13 +209,7 @@ def write_note(note=''):
     return note
 
 
-def renumber_pages():
-    db.Note.reset_index(inplace=True)
-    db.Note.page = db.Note.index
-    db.Note.page = db.Note.page.apply(lambda page: page + 1)
-
-
-def handle_query(query: str):
+def parse_query(query: str) -> dict:
     query = query.replace('&', '?')
     kwargs = {}
     if '?' in query:
@@ -182,24 +224,28 @@ def handle_query(query: str):
                 if len(field_func_split) > 1:
                     field += '__' + field_func_split[1]
 
-                if is_numeric(value):
+                if NUMERIC_VALUE.fullmatch(value):
                     if float(value) % 1 == 0:
-                        kwargs[field] = int(value)
+                        kwargs[field] = int(float(value)) if '.' in value else int(value)
                     else:
                         kwargs[field] = float(value)
                 else:
                     kwargs[field] = value
 
-    df = db.query('Note', **kwargs)
-    return df
+    return kwargs
+
+
+def handle_query(query: str, include_archive: bool = False):
+    kwargs = parse_query(query)
+    if include_archive:
+        kwargs['_include_archive'] = True
+    return db.query('Note', **kwargs)
 
 
 def handle_create():
     new_note = write_note()
-    page = db.query('Note').shape[0] + 1
     timestamp = datetime.now().timestamp()
-    df = db.create('Note', note=new_note, timestamp=timestamp, page=page)._to_df()
-    renumber_pages()
+    df = db.create('Note', note=new_note, timestamp=timestamp)._to_df()
     db.save()
     return df
 
@@ -210,7 +256,6 @@ def handle_update(query: str):
     updated_note = write_note(note=query_df.iloc[0].note)
     updated_title = next(iter(updated_note.split('\n')), 'Untitled')
     df = db.update('Note', query_df, note=updated_note, title=updated_title, timestamp=datetime.now().timestamp())
-    renumber_pages()
     db.save()
     return df
 
@@ -220,20 +265,51 @@ def handle_drop(query: str):
     confirm = input(f'This action will delete {df.shape[0]} notes, are you sure? [y/n] ').lower()
     if confirm == 'y' or confirm == 'yes':
         db.drop('Note', df)
-        renumber_pages()
         db.save()
 
 
-def handle_output(query: str, output: str):
+def handle_archive(query: str):
     df = handle_query(query)
-    df.to_csv(output, index=False)
+    confirm = input(f'This action will archive {df.shape[0]} notes, are you sure? [y/n] ').lower()
+    if confirm == 'y' or confirm == 'yes':
+        print(f'Archived {db.archive("Note", df)} notes to {config["ARCHIVE_PATH"]}')
+
+
+def report(action: str, rows: int, path: str, start: float):
+    seconds = perf_counter() - start
+    print(f'{action} {rows} notes {"to" if action == "Exported" else "from"} {path} in {seconds:.2f} s '
+          f'({rows / max(seconds, 1e-9):.0f} rows/s)')
+
+
+def handle_output(query: str, output: str):
+    start = perf_counter()
+    # The path is resolved here, a running daemon writes the file itself.
+    file_format = None if os.path.splitext(output)[1].lower() in STREAM_FORMATS else 'csv'
+    kwargs = parse_query(query)
+    if args.include_archive:
+        kwargs['_include_archive'] = True
+    rows = db.export('Note', os.path.abspath(output), file_format=file_format, **kwargs)
+    report('Exported', rows, output, start)
+
+
+def handle_import(path: str):
+    start = perf_counter()
+    rows = db.import_file('Note', os.path.abspath(path))
+    report('Imported', rows, path, start)
 
 
 def handle_default_view():
-    output(db.query('Note', timestamp__gt=(TODAY - timedelta(days=1)).timestamp()))
+    output(db.query('Note', timestamp__gt=(TODAY - timedelta(days=1)).timestamp(),
+                    _fields=['pk', 'page', 'title', 'timestamp']))
+
+
+def handle_daemon():
+    from pandas_db.utils import Server
+    Server(db, config['SOCKET']).run()
 
 
 def handle_shell():
+    import IPython
     IPython.embed()
 
 
@@ -245,11 +321,21 @@ def handle_page(page):
     output(db.query('Note', page=page))
 
 
+def handle_id(pk):
+    output(db.query('Note', pk=pk))
+
+
 def main():
-    if args.shell:
+    if args.daemon:
+        handle_daemon()
+    elif args.shell:
         handle_shell()
+    elif args.convert:
+        db.convert(args.convert)
     elif args.output:
         handle_output(args.query, args.output)
+    elif args.import_path:
+        handle_import(args.import_path)
     elif args.snippet:
         handle_snippet(args.query, args.snippet)
     elif args.execute:
@@ -262,10 +348,14 @@ def main():
         handle_update(args.query)
     elif args.drop:
         handle_drop(args.query)
+    elif args.archive:
+        handle_archive(args.query)
     elif args.page:
         handle_page(args.page)
+    elif args.id:
+        handle_id(args.id)
     elif args.query:
-        output(handle_query(args.query))
+        output(handle_query(args.query, args.include_archive))
     else:
         handle_default_view()
 
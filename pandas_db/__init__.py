@@ -1,2 +1,22 @@
-from .database import Database
-from .models import ModelManager, Model
+# Imported on first access so that importing pandas_db does not load the database, pandas_db.utils and pandas.
+_exports = {
+    'Database': 'database',
+    'ModelManager': 'models',
+    'Model': 'models',
+    'Record': 'models',
+    'computed': 'utils.computed',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = globals()[name] = getattr(__import__(f'{__name__}.{_exports[name]}', fromlist=[name]), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()).union(__all__))
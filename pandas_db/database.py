@@ -1,15 +1,39 @@
+from itertools import islice
 from uuid import uuid4
+import json
+
+import numpy as np
 import pandas as pd
 import os
 
 from .utils import (
+    append_journal,
     assert_datatypes,
-    column_filters,
-    handle_limit,
-    handle_sort,
+    cached_read,
+    column_bounds,
+    convert_column,
+    convert_storage,
+    execute,
+    foreign_key_operators,
+    get_storage,
     hydrate,
     is_datetime,
-    parse_datatype,
+    json_fields,
+    parse_chunk,
+    plan,
+    QueryCache,
+    read_chunks,
+    read_journal,
+    read_segments,
+    replay_journal,
+    Schema,
+    text_fields,
+    SortedIndex,
+    TrigramIndex,
+    validate_frame,
+    WordIndex,
+    write_chunks,
+    write_segments,
 )
 
 from .models import ModelManager, Model
@@ -18,26 +42,60 @@ pd.options.mode.chained_assignment = None
 
 
 class Database:
+    # Index classes by kind. Each provides build(pks, values), add(pk, value) and remove(pk), or build(values),
+    # add_rows(positions, values) and drop_rows(positions) when it is positional.
+    index_types = {'word': WordIndex, 'trigram': TrigramIndex, 'sorted': SortedIndex}
+
     def __init__(self, models: ModelManager = ModelManager(), path: str = 'data/', archive_path: str = 'archive/',
-                 archive_limit: int = 0):
+                 archive_limit: int = 0, journal: bool = False, journal_limit: int = 1_000_000, storage=None,
+                 load_cache: bool = True, query_cache: int = 0):
         '''
         Simple in-memory database built with pandas to store data in ram.
         This is a "Pandas Database".
+        :param journal: append changes to a per model log on save instead of rewriting each table.
+        :param journal_limit: log size in bytes after which save compacts the log into the table file. 0 disables it.
+        :param storage: storage backend name or instance, see utils.storage. Detected from the files in path if None.
+        :param load_cache: keep the parsed json tables in path/.cache and only parse them again once their file changed.
+        :param query_cache: bytes of query results to keep for repeated queries, see utils.query_cache. 0 disables it.
         '''
         self.models = models
-        # TODO ensure this is OS compatible.
-        self.path = path
-        self.archive_path = archive_path
+        # Files are always found with os.path.join, the folders may be given with or without a trailing separator
+        # and with ~ for the home folder.
+        self.path = os.path.expanduser(path)
+        self.archive_path = os.path.expanduser(archive_path)
         self.archive_limit = archive_limit
+        self.journal = journal
+        self.journal_limit = journal_limit
+        self.load_cache = load_cache
+        self.query_cache = QueryCache(query_cache) if query_cache else None
+        self._journal = {}
+        self._migrated = False
+        self._index_specs = {}
+        self._indexes = {}
+        self._pk_positions = {}
+        self.storage = get_storage(storage, path, models)
 
         self.load()
 
     def __setitem__(self, key, value):
-            self.__dict__[key] = value
+        # A table replaced directly may have any rows, its indexes are built again. create and bulk_create append
+        # through set_table and update the indexes themselves.
+        self.set_table(key, value)
+        self.reindex(key)
 
     def __getitem__(self, key):
+        if key in self.__dict__.get('_unloaded', ()):
+            self.load_table(key)
         return self.__dict__[key]
 
+    def __getattr__(self, key):
+        # Only called when the attribute is missing, which is the case for tables that have not been loaded yet.
+        if key in self.__dict__.get('_unloaded', ()):
+            self.load_table(key)
+            if key in self.__dict__:
+                return self.__dict__[key]
+        raise AttributeError(f'{self.__class__.__name__} has no attribute "{key}"')
+
     def has(self, model_name: str) -> bool:
         if hasattr(self, model_name):
             if isinstance(self[model_name], pd.DataFrame):
@@ -46,6 +104,8 @@ class Database:
         return False
 
     def create(self, model_name, **kwargs) -> Model:
+        if ordinal := self.models[model_name]._ordinal:
+            kwargs[ordinal] = (self[model_name].shape[0] if self.has(model_name) else 0) + 1
         instance = self.models[model_name](**kwargs)
         datatypes = instance._schema.datatypes()
         for key, value in kwargs.items():
@@ -54,77 +114,304 @@ class Database:
         df = instance._to_df()
 
         if self.has(model_name):
-            self[model_name] = pd.concat([self[model_name], df], ignore_index=True)
+            self.set_table(model_name, pd.concat([self[model_name], df], ignore_index=True))
         else:
             self[model_name] = df
+        if (pk_positions := self._pk_positions.get(model_name)) is not None:
+            pk_positions[instance.pk] = self[model_name].shape[0] - 1
+        self.index_rows(model_name, df, positions=[self[model_name].shape[0] - 1])
+        unstored = self.unstored_columns(model_name)
+        self.log(model_name, 'create', records=[
+            {field: value for field, value in instance._to_dict().items() if field not in unstored}])
         return instance
 
-    def query(self, model_name: str, **kwargs) -> pd.DataFrame:
+    def bulk_create(self, model_name: str, records) -> pd.DataFrame:
+        '''
+        Inserts many rows with a single concatenation, without building a Model per row.
+        :param records: list or iterable of dicts, or a DataFrame. Missing fields get their default values and
+        missing pks are generated.
+        '''
+        model = self.models[model_name]
+        schema = Schema.of(model)
+        df = records.reset_index(drop=True) if isinstance(records, pd.DataFrame) else pd.DataFrame(list(records))
+        if df.empty:
+            return df
+
+        datatypes = schema.datatypes()
+        assert not (unknown := set(df.columns).difference(datatypes)), f'Unknown fields {unknown} on {model_name}'
+        validate_frame(self, model, df).raise_for_errors()
+
+        if 'pk' not in df.columns:
+            df['pk'] = [str(uuid4()) for _ in range(df.shape[0])]
+        elif (missing := df.pk.isnull()).any():
+            df.loc[missing, 'pk'] = [str(uuid4()) for _ in range(missing.sum())]
+
+        properties = []
+        computed = schema.computed()
+        for field, default_value in schema.default_values().items():
+            class_value = vars(model).get(field)
+            if field in computed:
+                continue
+            elif isinstance(class_value, property) and class_value.fset is None:
+                properties.append((field, class_value.fget))
+            elif field not in df.columns:
+                if isinstance(default_value, (list, dict)):
+                    df[field] = [default_value.copy() for _ in range(df.shape[0])]
+                else:
+                    df[field] = default_value
+
+        for field, fget in properties:
+            df[field] = [fget(row) for row in df.itertuples(index=False)]
+        self.compute(model_name, df)
+
+        start = self[model_name].shape[0] if self.has(model_name) else 0
+        if ordinal := model._ordinal:
+            df[ordinal] = np.arange(start + 1, start + df.shape[0] + 1)
         if self.has(model_name):
-            df = self[model_name]
+            self.set_table(model_name, pd.concat([self[model_name], df], ignore_index=True))
+        else:
+            self[model_name] = df
+        if (pk_positions := self._pk_positions.get(model_name)) is not None:
+            pk_positions.update(zip(df.pk, range(start, start + df.shape[0])))
+        self.index_rows(model_name, df, positions=np.arange(start, start + df.shape[0]))
+        self.log(model_name, 'create', records=df.drop(
+            columns=self.unstored_columns(model_name), errors='ignore').to_dict('records'))
+        return df
+
+    def stream_create(self, model_name: str, records, chunk_size: int = 10_000, commit: bool = True) -> int:
+        '''
+        Inserts records from any iterable in chunks so only one chunk is held in memory at a time.
+        Saves the rows when commit is True, see create_chunks. Returns the number of rows inserted.
+        '''
+        if isinstance(records, pd.DataFrame):
+            chunks = (records.iloc[start:start + chunk_size] for start in range(0, records.shape[0], chunk_size))
+        else:
+            records = iter(records)
+            chunks = iter(lambda: list(islice(records, chunk_size)), [])
+        return self.create_chunks(model_name, chunks, commit=commit)
 
-            kwargs, df = handle_sort(kwargs, df)
-            kwargs, df = handle_limit(kwargs, df)
+    def create_chunks(self, model_name: str, chunks, commit: bool = True) -> int:
+        '''
+        Inserts each chunk with bulk_create and returns the number of rows inserted. When commit is True, with a
+        journal each chunk is saved to it and the table is written once at the end. Without one the whole table would
+        be written for each chunk, so it is only saved at the end.
+        '''
+        count = 0
+        journal_limit, self.journal_limit = self.journal_limit, 0
+        try:
+            for chunk in chunks:
+                count += self.bulk_create(model_name, chunk).shape[0]
+                if commit and self.journal:
+                    self.save()
+        finally:
+            self.journal_limit = journal_limit
+
+        if commit and self.journal:
+            self.compact(model_name)
+        elif commit:
+            self.save()
+        return count
+
+    def export(self, model_name: str, file_path: str, chunk_size: int = 10_000, file_format: str = None,
+               **kwargs) -> int:
+        '''
+        Writes the result of a query to a csv, jsonl or parquet file chunk_size rows at a time, the format is taken
+        from the extension unless given. Returns the number of rows written.
+        '''
+        chunks = self.query_chunks(model_name, chunk_size, **kwargs)
+        return write_chunks(file_path, chunks, file_format, json_fields(self.models[model_name]))
 
-            for field, value in kwargs.items():
+    def import_file(self, model_name: str, file_path: str, chunk_size: int = 10_000, file_format: str = None) -> int:
+        '''
+        Inserts the rows of a csv, jsonl or parquet file, like the ones written by export, chunk_size rows at a time.
+        Each chunk is validated by bulk_create. Rows whose pk is already in the table are skipped and the columns
+        the database derives are derived again. Returns the number of rows inserted.
+        '''
+        model = self.models[model_name]
+        derived = [*self.unstored_columns(model_name), *[
+            field for field, value in vars(model).items() if isinstance(value, property) and value.fset is None]]
 
-                if '__' in field:
+        def parsed_chunks():
+            for chunk in read_chunks(file_path, chunk_size, file_format, text_fields(self, model)):
+                chunk = parse_chunk(self, model, chunk.drop(columns=derived, errors='ignore'))
+                if 'pk' in chunk.columns and self.has(model_name):
+                    self.positions(model_name, [])
+                    known = self._pk_positions[model_name]
+                    chunk = chunk[[pk not in known for pk in chunk.pk]]
+                yield chunk
+
+        return self.create_chunks(model_name, parsed_chunks())
 
-                    column, operator = field.split('__', 1)
+    def query(self, model_name: str, **kwargs) -> pd.DataFrame:
+        '''
+        Filters a table with django style lookups.
+        :param _fields: optional list of columns to return. If the table has not been loaded yet and the storage
+        supports it, only these columns and the ones being filtered on are read.
+        '''
+        if self.query_cache is None or (key := QueryCache.key(model_name, kwargs)) is None:
+            return self.run_query(model_name, **kwargs)
 
-                    # FK lookup.
-                    if (foreign_model := self.models[model_name]()._schema.datatypes().get(column)) in self.models:
-                        assert (
-                            operator not in column_filters.keys()
-                        ), f'Unspecified field in foreign key lookup. Did you mean "{column}__pk__{operator}=..."?'
+        if (df := self.query_cache.get(key)) is None:
+            self.query_cache.put(key, df := self.run_query(model_name, **kwargs),
+                                 self.foreign_models(model_name, kwargs))
+        # Callers may change the frame they get, the cached one is kept as it was.
+        return df.copy()
 
-                        fk_series = self.query(foreign_model.__name__, **{operator: value}).pk
-                        temp_column_suffix = f'_{uuid4()}'
-                        df = pd.merge(left=df, right=fk_series, how='right', left_on=column, right_on='pk',
-                                      suffixes=(None, temp_column_suffix))
-                        df.drop(f'pk{temp_column_suffix}', inplace=True, axis=1)
+    def foreign_models(self, model_name: str, kwargs: dict) -> set:
+        '''
+        Returns the models the foreign key lookups of a query read, following nested lookups.
+        '''
+        models = set()
+        datatypes = Schema.of(self.models[model_name]).datatypes()
+        for field, value in kwargs.items():
+            column, operator = field.split('__', 1) if '__' in field else (field, 'eq')
+            if (foreign_model := datatypes.get(column)) in self.models and operator not in foreign_key_operators:
+                models |= {foreign_model.__name__, *self.foreign_models(foreign_model.__name__, {operator: value})}
+        return models
 
-                    # Special filters
-                    else:
-                        df = column_filters[operator](df, column, value)
+    def run_query(self, model_name: str, **kwargs) -> pd.DataFrame:
+        return next(self.query_chunks(model_name, None, **kwargs))
 
-                    if is_datetime(value):
-                        df[column] = df[column].dt.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    df = df[df[field] == value]
-            return df
+    def query_chunks(self, model_name: str, chunk_size: int = 10_000, **kwargs):
+        '''
+        Runs a query and yields the result chunk_size rows at a time, so only one chunk is copied out of the table
+        at once. Yields the whole result as one frame when chunk_size is None.
+        '''
+        fields = kwargs.pop('_fields', None)
+        include_archive = kwargs.pop('_include_archive', False)
+        if fields is not None and model_name in self._unloaded and self.storage.projection:
+            columns = {'pk', *fields, *[field.split('__')[0] for field in kwargs if not field.startswith('_')]}
+            if kwargs.get('_sort'):
+                columns.add(kwargs['_sort'].lstrip('-'))
+            df = self.read(model_name, columns=list(columns))
+        elif self.has(model_name):
+            df = self[model_name]
         else:
-            return pd.DataFrame()
+            df = None
+
+        sort = kwargs.pop('_sort', None)
+        limit = kwargs.pop('_limit', None)
+        positions = None if df is None else execute(self, model_name, df, self.plan(model_name, **kwargs))
+
+        if include_archive and (archived := self.read_archive(model_name, kwargs)) is not None:
+            if df is not None:
+                # Rows archived by a process that stopped before dropping them are still in the table.
+                archived = archived[~archived.pk.isin(df.pk)]
+            steps = self.plan(model_name, **kwargs)
+            for step in steps:
+                step.strategy = 'scan'
+            found = execute(self, model_name, archived, steps, indexes=False)
+            df = pd.concat([frame for frame in (None if df is None else df.iloc[positions], archived.iloc[found])
+                            if frame is not None], ignore_index=True)
+            positions = np.arange(df.shape[0])
+
+        if df is None:
+            yield pd.DataFrame()
+            return
+
+        if sort:
+            column = sort.lstrip('-')
+            index = self.get_index(model_name, column, 'sorted') if df is self.__dict__.get(model_name) else None
+            # Reading the index in order beats sorting once the rows to sort are a good part of the table.
+            if index is not None and positions.size * 8 > df.shape[0]:
+                positions = index.sort(positions, df.shape[0], descending=sort[0] == '-', limit=limit)
+            else:
+                order = df[column].iloc[positions].reset_index(drop=True).sort_values(ascending=sort[0] != '-')
+                positions = positions[order.index.to_numpy()]
+
+        if limit is not None:
+            positions = positions[:limit]
+
+        columns = slice(None) if fields is None else [df.columns.get_loc(field) for field in fields]
+        chunk_size = chunk_size or max(positions.size, 1)
+        for start in range(0, max(positions.size, 1), chunk_size):
+            # The result rows are only copied once, here.
+            chunk = df.iloc[positions[start:start + chunk_size], columns]
+
+            for field, value in kwargs.items():
+                if '__' in field and is_datetime(value):
+                    column = field.split('__', 1)[0]
+                    chunk[column] = chunk[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+
+            yield chunk
+
+    def plan(self, model_name: str, **kwargs) -> list:
+        '''
+        Orders the filters of a query so the cheapest and most selective run first.
+        '''
+        return plan(self, model_name, kwargs, Schema.of(self.models[model_name]).datatypes())
+
+    def explain(self, model_name: str, **kwargs) -> pd.DataFrame:
+        '''
+        Runs a query and returns the chosen plan with the rows and time spent in each step.
+        '''
+        kwargs = {field: value for field, value in kwargs.items() if not field.startswith('_')}
+        steps = self.plan(model_name, **kwargs)
+        if self.has(model_name):
+            execute(self, model_name, self[model_name], steps)
+        return pd.DataFrame([step.to_dict() for step in steps])
 
     def get(self, model_name, *args, **kwargs):
+        '''
+        Returns the row with the given pk, or the only row matching kwargs, as a Record of the model.
+        '''
         # If a pk has been given, find model by that pk
         if args:
             pk = args[0]
-            df = self.query(model_name, pk=pk)
-            if not df.empty:
-                return self.models[model_name](**df.iloc[0].to_dict())
+            if self.has(model_name) and (positions := self.positions(model_name, [pk])).size:
+                return next(self.models[model_name]._from_df(self[model_name].iloc[positions[:1]]))
 
         # If not, find it by kwargs
         else:
             df = self.query(model_name, **kwargs)
             if (num_models := df.shape[0]) == 1:
-                return self.models[model_name](**df.iloc[0].to_dict())
+                return next(self.models[model_name]._from_df(df))
             elif num_models == 0:
                 return None
             else:
                 raise ValueError(f'{num_models} {model_name} models found.')
 
+    def validate(self, model_name: str, df: pd.DataFrame = None):
+        '''
+        Checks a frame, or the stored table if none is given, against the model's datatypes and returns a report
+        of the offending row positions per field.
+        '''
+        return validate_frame(self, self.models[model_name], self[model_name] if df is None else df)
+
+    def records(self, model_name: str, **kwargs):
+        '''
+        Queries a table and yields each row as a slotted Record of the model.
+        '''
+        yield from self.models[model_name]._from_df(self.query(model_name, **kwargs))
+
     def update(self, model_name: str, query: pd.DataFrame, **kwargs):
         if query.empty:
             return query
 
-        datatypes = self.models[model_name]()._schema.datatypes()
+        schema = Schema.of(self.models[model_name])
+        datatypes = schema.datatypes()
+        assert not (unstored := set(kwargs).intersection(self.unstored_columns(model_name))), \
+            f'{unstored} are computed by the database'
 
+        df = self[model_name]
+        positions = self.positions(model_name, query.pk)
         for field, value in kwargs.items():
             assert_datatypes(self, datatypes[field], value, field)
-            self[model_name][field].iloc[query.index] = [value]
-
-        return self[model_name].iloc[query.index]
+            if isinstance(value, (list, dict)):
+                for position in positions:
+                    df.iat[position, df.columns.get_loc(field)] = value
+            else:
+                df.iloc[positions, df.columns.get_loc(field)] = value
+
+        self.compute(model_name, df, positions, fields=kwargs.keys())
+        self.invalidate(model_name)
+        if 'pk' in kwargs:
+            self._pk_positions.pop(model_name, None)
+        changed = {*kwargs, *[column for column, computed in schema.computed().items()
+                              if set(computed.depends_on).intersection(kwargs)]}
+        self.index_rows(model_name, df.iloc[positions], columns=changed, positions=positions)
+        self.log(model_name, 'update', pks=query.pk.tolist(), fields=kwargs)
+        return df.iloc[positions]
 
     def drop(self, model_name: str, query: pd.DataFrame, cascade: list[str, ...] = []) -> pd.DataFrame:
         '''
@@ -135,7 +422,7 @@ class Database:
             return
 
         if cascade:
-            datatypes = self.models[model_name]()._schema.datatypes()
+            datatypes = Schema.of(self.models[model_name]).datatypes()
             nested_field = None
             for field in cascade:
                 if '__' in field:
@@ -149,22 +436,66 @@ class Database:
                         else:
                             self.drop(foreign_model_name, foreign_query)
 
-        self[model_name].drop(index=query.index, inplace=True)
-
-    def archive(self, model_name: str, query: pd.DataFrame, cascade=False):
-        assert self.models[model_name], f'Uknown model "{model_name}"'
+        # Rows are found by pk, the query may not come from the table, e.g. when it includes archived rows.
+        dropped = self.positions(model_name, query.pk)
+        first = dropped[:1]
+        df = self[model_name]
+        pks = df.pk.iloc[dropped]
+        self.unindex_rows(model_name, pks, dropped)
+        self.log(model_name, 'drop', pks=pks.tolist())
+        df.drop(index=df.index[dropped], inplace=True)
+        self.invalidate(model_name)
+        # Rows after the dropped ones have moved, positions are found again on the next lookup.
+        self._pk_positions.pop(model_name, None)
+        if (ordinal := self.models[model_name]._ordinal) and first.size:
+            df = self[model_name]
+            df.iloc[first[0]:, df.columns.get_loc(ordinal)] = np.arange(first[0] + 1, df.shape[0] + 1)
 
+    def archive(self, model_name: str, query: pd.DataFrame, cascade: list[str, ...] = []) -> int:
+        '''
+        Moves the queried rows out of the table into gzipped segments under archive_path, one per month of the
+        model's _archive_by field, that are never changed afterwards. The table is compacted so its file shrinks.
+        Archived rows are only returned by queries with _include_archive=True. When archive_limit is set only that
+        many rows, the last ones of the query, are archived. Returns the number of rows archived.
+        '''
+        model = self.models[model_name]
         if self.archive_limit > 0:
             query = query.tail(self.archive_limit)
+        if query.empty:
+            return 0
 
-        if not query.empty:
-            json_file_path = os.path.join(self.archive_path, f'{model_name}.json')
-            query.to_json(json_file_path, orient='records', indent=4)
-            self.drop(model_name, '')
+        # Whole rows, the query may only hold some of the columns.
+        rows = self[model_name].iloc[self.positions(model_name, query.pk)]
+        write_segments(self.archive_path, model_name, rows.drop(columns=self.unstored_columns(model_name)),
+                       model._archive_by)
+        self.drop(model_name, query, cascade=cascade)
+        self.compact(model_name)
+        return rows.shape[0]
 
+    def read_archive(self, model_name: str, kwargs: dict = None) -> pd.DataFrame:
+        '''
+        Reads the archived rows of a model, or None if there are none. When the model has an _archive_by field, only
+        the segments overlapping the range the lookups in kwargs allow on it are read.
+        '''
+        model = self.models[model_name]
+        lower, upper = column_bounds(kwargs or {}, model._archive_by) if model._archive_by else (None, None)
+        if (df := read_segments(self.archive_path, model_name, lower, upper)) is None:
+            return None
+
+        df = parse_chunk(self, model, df)
+        self.compute(model_name, df)
+        if model._ordinal:
+            # Archived rows are not numbered.
+            df[model._ordinal] = np.nan
+        return df
 
     def hydrate(self, model_name: str, **kwargs):
-        return hydrate(self, model_name, self.query(model_name, **kwargs))
+        '''
+        Queries a table and yields its rows as Records with foreign keys resolved to the Records they point to.
+        :param _depth: optional number of foreign key levels to resolve. All levels are resolved by default.
+        '''
+        depth = kwargs.pop('_depth', None)
+        return hydrate(self, model_name, self.query(model_name, **kwargs), depth=depth)
 
     def init_table(self, model):
         self[model.__name__] = model()._to_df().iloc[0:0]
@@ -174,58 +505,341 @@ class Database:
             if not self.has(model.__name__):
                 self.init_table(model)
 
+    def init_nulls(self, model, fields=None):
+        df = self[model.__name__]
+        for field, datatype in Schema.of(model).datatypes().items():
+            if fields is not None and field not in fields:
+                continue
+            nulls_index = df[field].isnull()
+            if nulls_index.any() and datatype not in self.models:
+                if hasattr(datatype, '__origin__'):
+                    df.loc[nulls_index, field] = pd.Series(
+                        [datatype.__origin__() for _ in range(nulls_index.sum())], index=df.index[nulls_index])
+                else:
+                    df.loc[nulls_index, field] = datatype()
+        self.compute(model.__name__, df, fields=fields)
+        self.invalidate(model.__name__)
+
     def audit_nulls(self):
         for model in self.models:
-            instance = model()
-            for field, datatype in instance._schema.datatypes().items():
-                nulls_index = self[instance._name][field].isnull()
-                if nulls_index.sum() and datatype not in self.models:
-                    self[instance._name].loc[nulls_index, field] = pd.Series([datatype()] * nulls_index.sum())
+            self.init_nulls(model)
 
-    def init_datatypes(self, model):
-        instance = model()
-        for field, datatype, default_value in instance._schema.items():
-            self[instance._name][field].apply(lambda value: parse_datatype(self, datatype, value))
+    def init_datatypes(self, model, fields=None):
+        df = self[model.__name__]
+        for field, datatype in Schema.of(model).datatypes().items():
+            if fields is None or field in fields:
+                df[field] = convert_column(self, datatype, df[field])
+        self.invalidate(model.__name__)
 
     def audit_datatypes(self):
         for model in self.models:
             self.init_datatypes(model)
 
     def init_fields(self, model):
-        instance = model()
-        if self.has(instance._name):
-            loaded_fields = set(self[instance._name].columns)
+        model_name = model.__name__
+        if self.has(model_name):
+            loaded_fields = set(self[model_name].columns)
         else:
             loaded_fields = set()
-        model_fields = set([field for field in instance._schema.fields()])
+        model_fields = set([field for field in Schema.of(model).fields()])
         new_fields = model_fields.difference(loaded_fields)
         removed_fields = loaded_fields.difference(model_fields)
 
         for field in new_fields:
-            self[instance._name][field] = None
+            self[model_name][field] = None
+        self.invalidate(model_name)
 
         for field in removed_fields:
-            self[instance._name] = self[instance._name].drop(field, axis=1)
+            self[model_name] = self[model_name].drop(field, axis=1)
 
     def audit_fields(self):
         for model in self.models:
             self.init_fields(model)
 
+    def fingerprint_path(self, model_name: str) -> str:
+        return os.path.join(self.path, f'{model_name}.schema.json')
+
+    def read_fingerprint(self, model_name: str) -> dict:
+        if os.path.isfile(fingerprint_file_path := self.fingerprint_path(model_name)):
+            with open(fingerprint_file_path) as fingerprint_file:
+                return json.load(fingerprint_file)
+        return None
+
+    def write_fingerprint(self, model):
+        with open(self.fingerprint_path(model.__name__), 'w') as fingerprint_file:
+            json.dump(Schema.of(model).fingerprint(), fingerprint_file, indent=4)
+
+    def migrate_table(self, model):
+        '''
+        Brings a table up to date with its model. Skipped when the schema fingerprint stored with the data matches
+        the model, otherwise only new fields and fields whose datatype changed are converted. The converted table is
+        written back so the next load takes the fast path.
+        '''
+        model_name = model.__name__
+        if not self.has(model_name):
+            self.init_table(model)
+
+        schema = Schema.of(model)
+        fingerprint = schema.fingerprint()
+        stored = self.read_fingerprint(model_name)
+        new_fields = set(schema.fields()).difference(self[model_name].columns)
+        if stored == fingerprint and set(self[model_name].columns) == set(schema.fields()):
+            return
+
+        stored_datatypes = (stored or {}).get('datatypes', {})
+        changed_fields = new_fields.union(
+            field for field, datatype in fingerprint['datatypes'].items() if stored_datatypes.get(field) != datatype)
+
+        self.init_fields(model)
+        self.init_nulls(model, changed_fields)
+        self.init_datatypes(model, changed_fields)
+        if stored != fingerprint and not self[model_name].empty:
+            self.compact(model_name)
+
     def migrate(self):
-        self.audit_tables()
-        self.audit_fields()
-        self.audit_nulls()
-        self.audit_datatypes()
+        '''
+        Brings the loaded tables up to date with their models. Tables that have not been loaded yet are migrated
+        when they are first accessed.
+        '''
+        self._migrated = True
+        for model in self.models:
+            if model.__name__ not in self._unloaded:
+                self.migrate_table(model)
 
-    def save(self):
+    def positions(self, model_name: str, pks) -> np.ndarray:
+        '''
+        Returns the sorted row positions of the given pks using a hash map from pk to position.
+        The map is built on the first lookup, extended by create and rebuilt after a drop.
+        '''
+        if (pk_positions := self._pk_positions.get(model_name)) is None:
+            pk_positions = {pk: position for position, pk in enumerate(self[model_name].pk)}
+            self._pk_positions[model_name] = pk_positions
+
+        return np.sort(np.fromiter({pk_positions[pk] for pk in pks if pk in pk_positions}, dtype=np.int64))
+
+    def set_table(self, model_name: str, df: pd.DataFrame):
+        '''
+        Replaces a table in memory and keeps its indexes, for changes that update them row by row.
+        '''
+        self.__dict__[model_name] = df
+        self.__dict__.get('_unloaded', set()).discard(model_name)
+        self.invalidate(model_name)
+
+    def reindex(self, model_name: str):
+        '''
+        Discards the indexes of a table. Needed after replacing a table directly instead of through create, update
+        and drop.
+        '''
+        self._indexes.pop(model_name, None)
+        self._pk_positions.pop(model_name, None)
+        self.invalidate(model_name)
+
+    def invalidate(self, model_name: str = None):
+        '''
+        Drops the cached query results of a model, or of all models if no model_name is given.
+        '''
+        if (query_cache := self.__dict__.get('query_cache')) is not None:
+            query_cache.invalidate(model_name)
+
+    def create_index(self, model_name: str, column: str, kind: str = 'word'):
+        '''
+        Registers an index on a column. It is built the first time a query needs it and kept up to date by
+        create, update and drop. Sorted indexes answer range lookups, max, min and _sort on numeric columns.
+        '''
+        assert kind in self.index_types, f'Unknown index kind "{kind}". Options are {list(self.index_types)}'
+        if kind == 'sorted':
+            model = self.models[model_name]
+            assert Schema.of(model).datatypes().get(column) in (int, float), \
+                f'Sorted indexes need an int or float field, {model_name}.{column} is not one'
+            assert column != model._ordinal, f'{model_name}.{column} is already looked up by row position'
+        self._index_specs.setdefault(model_name, set()).add((column, kind))
+
+    def get_index(self, model_name: str, column: str, kind: str, build: bool = True):
+        '''
+        Returns the index on a column, or None if there is none or it has not been built and build is False.
+        '''
+        if (column, kind) not in self._index_specs.get(model_name, ()) or model_name in self._unloaded:
+            return None
+
+        indexes = self._indexes.setdefault(model_name, {})
+        if (column, kind) not in indexes and build:
+            df = self[model_name]
+            if getattr(self.index_types[kind], 'positional', False):
+                indexes[(column, kind)] = self.index_types[kind].build(df[column])
+            else:
+                indexes[(column, kind)] = self.index_types[kind].build(df.pk, df[column])
+        return indexes.get((column, kind))
+
+    def candidates(self, model_name: str, column: str, operator: str, value):
+        '''
+        Narrows __f and __re lookups to the pks that may match using the column's indexes.
+        A word index is only used once it has been built, as building it costs more than a single scan.
+        Returns None if no index applies.
+        '''
+        if operator == 'f':
+            if index := self.get_index(model_name, column, 'trigram'):
+                return index.candidates(value)
+            if index := self.get_index(model_name, column, 'word', build=False):
+                return index.candidates(value)
+
+        elif operator == 're':
+            if index := self.get_index(model_name, column, 'trigram'):
+                return index.regex_candidates(value)
+
+        return None
+
+    def index_rows(self, model_name: str, df: pd.DataFrame, columns=None, positions=None):
+        '''
+        Adds new or changed rows to the indexes of a table. positions are the rows of df in the table.
+        '''
+        for (column, kind), index in self._indexes.get(model_name, {}).items():
+            if columns is None or column in columns:
+                if getattr(index, 'positional', False):
+                    index.add_rows(positions, df[column])
+                    continue
+                for pk, value in zip(df.pk, df[column]):
+                    index.add(pk, value)
+
+    def unindex_rows(self, model_name: str, pks, positions=None):
+        for index in self._indexes.get(model_name, {}).values():
+            if getattr(index, 'positional', False):
+                index.drop_rows(positions)
+                continue
+            for pk in pks:
+                index.remove(pk)
+
+    def log(self, model_name: str, op: str, **kwargs):
+        '''
+        Records a change to be appended to the model's journal on the next save.
+        '''
+        if self.journal:
+            self._journal.setdefault(model_name, []).append({'op': op, **kwargs})
+
+    def journal_path(self, model_name: str) -> str:
+        return os.path.join(self.path, f'{model_name}.log')
+
+    def cache_path(self, model_name: str) -> str:
+        return os.path.join(self.path, '.cache', f'{model_name}.pkl')
+
+    def compact(self, model_name: str = None):
+        '''
+        Folds the journal back into the table file. Compacts all models if no model_name is given.
+        '''
         for model in self.models:
-            json_file_path = os.path.join(self.path, f'{model.__name__}.json')
-            self[model.__name__].to_json(json_file_path, orient='records', indent=4)
+            if model_name is None or model.__name__ == model_name:
+                if not self.has(model.__name__):
+                    continue
+                self.storage.write(self.path, model.__name__, self[model.__name__].drop(
+                    columns=self.unstored_columns(model.__name__), errors='ignore'), model._compressed)
+                self.write_fingerprint(model)
+                if os.path.isfile(journal_file_path := self.journal_path(model.__name__)):
+                    os.remove(journal_file_path)
+                self._journal.pop(model.__name__, None)
+
+    def save(self):
+        if not self.journal:
+            # Tables that were never loaded are unchanged on disk.
+            for model in self.models:
+                if model.__name__ not in self._unloaded:
+                    self.compact(model.__name__)
+            return
+
+        for model_name, entries in list(self._journal.items()):
+            journal_size = append_journal(self.journal_path(model_name), entries)
+            # Rows journaled into a table that was never written match the model as it is now, they need no conversion
+            # when the journal is read back.
+            if not os.path.isfile(self.fingerprint_path(model_name)):
+                self.write_fingerprint(self.models[model_name])
+            if self.journal_limit and journal_size > self.journal_limit:
+                self.compact(model_name)
+        self._journal = {}
+
+    def read(self, model_name: str, columns: list = None):
+        '''
+        Reads a table from storage and replays its journal without keeping it in the database.
+        Returns None if nothing has been stored for the model.
+        '''
+        schema = Schema.of(self.models[model_name])
+        if columns is not None:
+            computed = schema.computed()
+            columns = list({*columns, *[
+                field for column in columns if column in computed for field in computed[column].depends_on]})
+
+        df = None
+        if self.storage.exists(self.path, model_name):
+            if self.load_cache and self.storage.cache:
+                df = cached_read(
+                    self.cache_path(model_name), self.storage.file_path(self.path, model_name),
+                    lambda content: self.storage.read(self.path, model_name, schema.datatypes(), content=content),
+                    version=f'{self.storage.name}:{schema.fingerprint()["fingerprint"]}')
+                if columns is not None:
+                    df = df[[column for column in columns if column in df.columns]]
+            else:
+                df = self.storage.read(self.path, model_name, schema.datatypes(), columns=columns)
+
+        if entries := read_journal(self.journal_path(model_name)):
+            df = replay_journal(pd.DataFrame() if df is None else df, entries)
+            if columns is not None:
+                df = df[[column for column in columns if column in df.columns]]
+
+        if df is not None:
+            self.compute(model_name, df)
+            if ordinal := self.models[model_name]._ordinal:
+                df[ordinal] = np.arange(1, df.shape[0] + 1)
+        return df
+
+    def unstored_columns(self, model_name: str) -> list:
+        '''
+        Returns the columns the database derives when a table is read, they are left out of its files and journal.
+        '''
+        model = self.models[model_name]
+        return [*Schema.of(model).computed(), *([model._ordinal] if model._ordinal else [])]
+
+    def compute(self, model_name: str, df: pd.DataFrame, positions: np.ndarray = None, fields=None):
+        '''
+        Fills the computed columns of df in place, for the whole frame at once or only for the rows at positions.
+        :param fields: only recompute the columns depending on these fields.
+        '''
+        for computed in set(Schema.of(self.models[model_name]).computed().values()):
+            if not set(computed.depends_on).issubset(df.columns):
+                continue
+            if fields is not None and not set(computed.depends_on).intersection(fields):
+                continue
+
+            if positions is None:
+                for column, values in computed.compute(df).items():
+                    df[column] = values
+            else:
+                for column, values in computed.compute(df.iloc[positions]).items():
+                    df.iloc[positions, df.columns.get_loc(column)] = values.to_numpy()
+
+    def load_table(self, model_name: str):
+        self._unloaded.discard(model_name)
+        if (df := self.read(model_name)) is not None:
+            self[model_name] = df
+
+        if self._migrated:
+            self.migrate_table(self.models[model_name])
 
     def load(self):
+        '''
+        Discards the tables in memory. Each table is read again from storage the first time it is accessed.
+        '''
+        self._journal = {}
+        self._indexes = {}
+        self._pk_positions = {}
+        self.invalidate()
         for model in self.models:
-            json_file_path = os.path.join(self.path, f'{model.__name__}.json')
-            if os.path.isfile(json_file_path):
-                datatypes = model()._schema.datatypes()
-                self[model.__name__] = pd.read_json(json_file_path, orient='records', convert_dates=False,
-                                                    dtype=datatypes)
+            self.__dict__.pop(model.__name__, None)
+        self._unloaded = set(model.__name__ for model in self.models)
+
+    def convert(self, storage):
+        '''
+        Converts the stored tables to another storage backend and uses it from then on.
+        The journal is compacted first so no changes are lost.
+        '''
+        if self.journal:
+            self.compact()
+        storage = get_storage(storage)
+        convert_storage(self.path, self.models, self.storage, storage)
+        self.storage = storage
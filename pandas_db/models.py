@@ -1,11 +1,29 @@
+from itertools import repeat
 from uuid import uuid4
 import pandas as pd
-from .utils import to_snake, Schema
+from .utils import to_snake, Computed, Schema
 
 
 class Model:
+    # Name of an int field numbering the rows of the table from 1 in the order they were created. It is kept by the
+    # database instead of being stored and shifts down when earlier rows are dropped.
+    _ordinal = None
+    # Name of a float or int field holding epoch seconds. Archived rows are split by its month so queries on a range of
+    # it only read the archive segments that overlap the range.
+    _archive_by = None
+    # Names of long text fields the columnar storage backends compress, see utils.compression. Only decompressed when
+    # they are read.
+    _compressed = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Computed columns become read-only fields.
+        for computed in [value for value in vars(cls).values() if isinstance(value, Computed)]:
+            for column in computed.columns:
+                setattr(cls, column, computed.field(column))
+
     def __init__(self, **kwargs):
-        self._schema = Schema(self)
+        self._schema = Schema.of(self.__class__)
         self._name = self.__class__.__name__
         self.__dict__.update(self._schema.default_values())
         for field in self._schema.fields():
@@ -57,6 +75,80 @@ class Model:
     def __str__(self):
         return self._name
 
+    @classmethod
+    def _record_class(cls) -> type:
+        '''
+        Returns the slotted Record class generated for this model's schema.
+        '''
+        schema = Schema.of(cls)
+        if schema.record_class is None:
+            fields = tuple(schema.fields())
+            # A generated __init__ assigns each slot directly instead of looping over the field names per record.
+            namespace = {}
+            exec(f'def __init__(self, {"".join(f"{field}=None, " for field in fields)}):\n'
+                 f'    {"; ".join(f"self.{field} = {field}" for field in fields) or "pass"}', namespace)
+            schema.record_class = type(f'{cls.__name__}Record', (Record,), {
+                '__slots__': fields,
+                '__init__': namespace['__init__'],
+                '_fields': fields,
+                '_name': cls.__name__,
+                '_schema': schema,
+            })
+        return schema.record_class
+
+    @classmethod
+    def _from_row(cls, row: dict) -> 'Record':
+        return cls._record_class()._from_row(row)
+
+    @classmethod
+    def _from_df(cls, df: pd.DataFrame):
+        '''
+        Yields a lightweight Record per row of df. Fields missing from df are None.
+        Each column is converted to a list at once and the records are built from the lists.
+        '''
+        record_class = cls._record_class()
+        yield from map(record_class, *[
+            df[field].tolist() if field in df.columns else repeat(None, df.shape[0]) for field in record_class._fields])
+
+
+class Record:
+    '''
+    Compact row of a model with one slot per field and no per instance schema.
+    Generated per model by Model._record_class().
+    '''
+    __slots__ = ()
+    _fields = ()
+    _name = ''
+    _schema = None
+
+    def __init__(self, *values):
+        for field, value in zip(self._fields, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def _from_row(cls, row: dict) -> 'Record':
+        return cls(*[row.get(field) for field in cls._fields])
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def _to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self._fields}
+
+    def _to_df(self) -> pd.DataFrame:
+        return pd.DataFrame([self._to_dict()])
+
+    def __repr__(self):
+        df = self._to_df().transpose()
+        df.columns = [self._name]
+        return df.to_string()
+
+    def __str__(self):
+        return self._name
+
 
 class ModelManager:
     def __init__(self, *models):
@@ -1,18 +1,105 @@
+'''
+Helpers are imported from their module on first access, so importing one of them does not pull in the others and
+their dependencies. Helpers named after their module are imported eagerly, as importing the module binds it on this
+package under the same name.
+'''
 from .assert_datatypes import assert_datatypes
-# from .client import Client
-from .database import handle_sort, handle_limit, column_filters
+from .computed import computed
 from .encrypt import encrypt
 from .file_to_string import file_to_string
-from .hydrate import hydrate, parse_datatype, retrieve_foreign_data, CORE_TYPES, OUTER_TYPES
+from .hydrate import hydrate
 from .is_datetime import is_datetime
 from .is_numeric import is_numeric
-from .object import Object
 from .parse_headers import parse_headers
 from .parse_list import parse_list
 from .parse_nums import parse_nums
 from .parse_set import parse_set
 from .resolve_default_value import resolve_default_value
-from .schema import Schema
-from .server import on_connect, on_disconnect, on_log
 from .string_to_file import string_to_file
 from .to_snake import to_snake
+
+_exports = {
+    'column_bounds': 'archive',
+    'read_manifest': 'archive',
+    'read_segments': 'archive',
+    'write_segments': 'archive',
+    'AsyncClient': 'client',
+    'Client': 'client',
+    'connect': 'client',
+    'decode_result': 'client',
+    'dump_message': 'client',
+    'handle_sort': 'database',
+    'handle_limit': 'database',
+    'column_filters': 'database',
+    'CompressionStats': 'compression',
+    'compress_column': 'compression',
+    'compress_values': 'compression',
+    'decompress_values': 'compression',
+    'train_dictionary': 'compression',
+    'Computed': 'computed',
+    'convert_column': 'hydrate',
+    'convert_value': 'hydrate',
+    'hydrate_records': 'hydrate',
+    'parse_datatype': 'hydrate',
+    'retrieve_foreign_data': 'hydrate',
+    'CORE_TYPES': 'hydrate',
+    'OUTER_TYPES': 'hydrate',
+    'append_journal': 'journal',
+    'read_journal': 'journal',
+    'replay_journal': 'journal',
+    'cached_read': 'load_cache',
+    'file_hash': 'load_cache',
+    'Object': 'object',
+    'Step': 'planner',
+    'column_masks': 'planner',
+    'execute': 'planner',
+    'foreign_key_operators': 'planner',
+    'plan': 'planner',
+    'QueryCache': 'query_cache',
+    'Schema': 'schema',
+    'type_name': 'schema',
+    'on_connect': 'server',
+    'on_disconnect': 'server',
+    'on_log': 'server',
+    'Server': 'server',
+    'encode_result': 'server',
+    'JsonStorage': 'storage',
+    'ColumnarStorage': 'storage',
+    'STORAGE_BACKENDS': 'storage',
+    'get_storage': 'storage',
+    'convert_storage': 'storage',
+    'SortedIndex': 'sorted_index',
+    'range_operators': 'sorted_index',
+    'STREAM_FORMATS': 'stream',
+    'json_fields': 'stream',
+    'parse_chunk': 'stream',
+    'read_chunks': 'stream',
+    'text_fields': 'stream',
+    'write_chunks': 'stream',
+    'TrigramIndex': 'trigram_index',
+    'compile_pattern': 'trigram_index',
+    'required_literals': 'trigram_index',
+    'ValidationReport': 'validate',
+    'invalid_positions': 'validate',
+    'validate_frame': 'validate',
+    'WordIndex': 'word_index',
+    'search': 'word_index',
+    'tokenize': 'word_index',
+}
+
+__all__ = [
+    'assert_datatypes', 'computed', 'encrypt', 'file_to_string', 'hydrate', 'is_datetime', 'is_numeric',
+    'parse_headers', 'parse_list', 'parse_nums', 'parse_set', 'resolve_default_value', 'string_to_file', 'to_snake',
+    *_exports]
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = globals()[name] = getattr(__import__(f'{__name__}.{_exports[name]}', fromlist=[name]), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()).union(__all__))
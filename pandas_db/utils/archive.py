@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Lookups that bound the values of a column, used to skip segments outside the range.
+lower_bound_operators = ('eq', 'gt', 'ge')
+upper_bound_operators = ('eq', 'lt', 'le')
+
+
+def manifest_path(archive_path: str, model_name: str) -> str:
+    return os.path.join(archive_path, f'{model_name}.manifest.json')
+
+
+def read_manifest(archive_path: str, model_name: str) -> list:
+    '''
+    Returns the segments of a model's archive: dicts with the segment's file, rows, and min and max of the column it
+    is partitioned by.
+    '''
+    if os.path.isfile(manifest_file_path := manifest_path(archive_path, model_name)):
+        with open(manifest_file_path) as manifest_file:
+            return json.load(manifest_file)['segments']
+    return []
+
+
+def write_manifest(archive_path: str, model_name: str, segments: list):
+    # Replaced at once, a segment is only part of the archive once it is listed.
+    manifest_file_path = manifest_path(archive_path, model_name)
+    with open(f'{manifest_file_path}.tmp', 'w') as manifest_file:
+        json.dump({'segments': segments}, manifest_file, indent=4)
+    os.replace(f'{manifest_file_path}.tmp', manifest_file_path)
+
+
+def partition_names(values: pd.Series) -> pd.Series:
+    '''
+    Names the month of each epoch timestamp, in UTC. Missing timestamps go to the partition "none".
+    '''
+    return pd.to_datetime(values, unit='s', utc=True).dt.strftime('%Y-%m').fillna('none')
+
+
+def write_segments(archive_path: str, model_name: str, df: pd.DataFrame, partition_by: str = None) -> list:
+    '''
+    Writes rows to new gzipped json lines segments, one per month of the partition_by column or a single one when
+    the model is not partitioned. Existing segments are never changed. Returns the segments added to the manifest.
+    '''
+    os.makedirs(archive_path, exist_ok=True)
+    segments = read_manifest(archive_path, model_name)
+    if partition_by is None:
+        partitions = [('all', df)]
+    else:
+        partitions = df.groupby(partition_names(df[partition_by]).to_numpy(), sort=True)
+
+    added = []
+    for name, rows in partitions:
+        number = sum(segment['partition'] == name for segment in segments + added)
+        file_name = f'{model_name}.{name}.{number}.jsonl.gz'
+        rows.to_json(os.path.join(archive_path, file_name), orient='records', lines=True, compression='gzip')
+        # Segments without a range are read by every query.
+        bounded = partition_by is not None and name != 'none'
+        added.append({
+            'file': file_name,
+            'partition': name,
+            'rows': rows.shape[0],
+            'min': rows[partition_by].min().item() if bounded else None,
+            'max': rows[partition_by].max().item() if bounded else None,
+            'created': datetime.now(timezone.utc).isoformat(),
+        })
+
+    write_manifest(archive_path, model_name, segments + added)
+    return added
+
+
+def column_bounds(kwargs: dict, column: str) -> tuple:
+    '''
+    Returns the lowest and highest value of column the lookups of a query allow, None when unbounded.
+    '''
+    lower, upper = None, None
+    for field, value in kwargs.items():
+        field_column, operator = field.split('__', 1) if '__' in field else (field, 'eq')
+        if field_column != column or not isinstance(value, (int, float, np.number)) or isinstance(value, bool):
+            continue
+        if operator in lower_bound_operators:
+            lower = value if lower is None else max(lower, value)
+        if operator in upper_bound_operators:
+            upper = value if upper is None else min(upper, value)
+    return lower, upper
+
+
+def read_segments(archive_path: str, model_name: str, lower=None, upper=None) -> pd.DataFrame:
+    '''
+    Reads the segments whose range overlaps lower and upper. Returns None if there are none.
+    '''
+    frames = []
+    for segment in read_manifest(archive_path, model_name):
+        if segment['min'] is not None and (
+                (upper is not None and segment['min'] > upper) or (lower is not None and segment['max'] < lower)):
+            continue
+        frames.append(pd.read_json(os.path.join(archive_path, segment['file']), orient='records', lines=True,
+                                   compression='gzip', dtype=False, convert_dates=False))
+    return pd.concat(frames, ignore_index=True) if frames else None
@@ -12,16 +12,10 @@ def assert_datatypes(db, datatype, value, field: str) -> None:
         assert type(value) is outer_type, assert_message
 
         if outer_type is list:
-            if inner_types[-1] is Ellipsis:
-                inner_type = inner_types[0]
-                for inner_value in value:
-                    assert_datatypes(db, inner_type, inner_value, field)
-
-            for inner_value, inner_type in zip(value[:len(inner_types)], inner_types):
-                if inner_type is Ellipsis:
-                    assert_datatypes(db, inner_types[0], inner_value, field)
-                else:
-                    assert_datatypes(db, inner_type, inner_value, field)
+            # Values past the last annotated type are checked against it, the way migrations convert them.
+            inner_types = [inner_type for inner_type in inner_types if inner_type is not Ellipsis]
+            for index, inner_value in enumerate(value):
+                assert_datatypes(db, inner_types[min(index, len(inner_types) - 1)], inner_value, field)
 
         elif outer_type is dict:
             assert len(inner_types) == 2, assert_message
@@ -1,90 +1,215 @@
+from itertools import count
 import asyncio
-# import aioconsole
-import websockets
-import argparse
-import sys
-
-
-# class Sender:
-#     def __init__(self, url: str, commands: dict = {}, headers: dict = {}):
-#         self.url = url
-#         self.json_string = None
-#         self.headers = headers
-
-#     async def gather_input(self):
-#         self.json_string = await aioconsole.ainput(":")
-
-#     async def handle_input(self, websocket):
-#         await self.gather_input()
-#         await self.parse_and_send(websocket)
-
-#     async def parse_and_send(self, websocket):
-#         await aioconsole.aprint('[SENDER]', self.json_string)
-#         await websocket.send(self.json_string)
-
-#     async def connect(self):
-#         async with websockets.connect(self.url, extra_headers=self.headers) as websocket:
-#             while True:
-#                 await self.handle_input(websocket)
-
-#     async def run(self):
-#         try:
-#             loop = asyncio.get_event_loop()
-#             loop.run_until_complete(await self.connect())
-#             loop.run_forever()
-#         except websockets.exceptions.ConnectionClosedError:
-#             asyncio.ensure_future(aioconsole.aprint('[SENDER] Connection closed.'))
-#             sys.exit()
-
-
-# class Reciever:
-#     def __init__(self, url: str, headers: dict = {}):
-#         self.url = url
-#         self.headers = headers
-#         self.previous_data = None
-
-#     async def connect(self):
-#         async with websockets.connect(self.url, extra_headers=self.headers) as websocket:
-#             while True:
-#                 asyncio.ensure_future(aioconsole.aprint('[RECIEVER]', await websocket.recv()))
-
-#     async def run(self):
-#         try:
-#             loop = asyncio.get_event_loop()
-#             loop.run_until_complete(await self.connect())
-#             loop.run_forever()
-#         except websockets.exceptions.ConnectionClosedError:
-#             asyncio.ensure_future(aioconsole.aprint('[RECIEVER] Connection closed.'))
-#             sys.exit()
-
-
-# class Client:
-#     def __init__(self, protocol='ws', host='localhost', port=5000, commands={}, headers={}):
-#         self.protocol = protocol
-#         self.host = host
-#         self.port = port
-#         self.commands = commands
-#         self.headers = headers
-#         self.sender = Sender(f'{protocol}://{host}:{port}', commands=commands, headers=headers)
-#         self.reciever = Reciever(f'{protocol}://{host}:{port}', headers=headers)
-
-#     async def run_sender(self):
-#         loop = asyncio.get_event_loop()
-#         loop.run_until_complete(await self.sender.run())
-#         loop.run_forever()
-
-#     async def run_reciever(self):
-#         loop = asyncio.get_event_loop()
-#         loop.run_until_complete(await self.reciever.run())
-#         loop.run_forever()
-
-#     def run(self):
-#         parser = argparse.ArgumentParser()
-#         parser.add_argument('cmd')
-#         args = parser.parse_args()
-
-#         if args.cmd == 'sender':
-#             asyncio.run(self.run_sender())
-
-#         elif args.cmd == 'reciever':
-#             asyncio.run(self.run_reciever())
+import json
+import socket
+
+import pandas as pd
+
+from .journal import to_json_value
+
+# Largest message in bytes, asyncio only reads lines of up to 64 KiB by default.
+MESSAGE_LIMIT = 2 ** 28
+
+
+def dump_message(message: dict) -> bytes:
+    return json.dumps(message, default=to_json_value).encode() + b'\n'
+
+
+def auth_message(message_id: int, token: str) -> bytes:
+    '''
+    First message of a connection to a server started with a token.
+    '''
+    return dump_message({'id': message_id, 'op': 'auth', 'token': token})
+
+
+def decode_result(response: dict, models=None, model_name: str = None):
+    '''
+    Rebuilds the result of a server call. Records are rebuilt as Records of their model when the models are known.
+    '''
+    if response['type'] == 'frame':
+        return pd.DataFrame(response['data'], columns=response['columns'])
+    if response['type'] == 'record' and models is not None and model_name in models:
+        return models[model_name]._from_row(response['data'])
+    return response['data']
+
+
+class Client:
+    '''
+    Talks to a Server with the same methods as the Database it serves, over a Unix socket when a path is given and
+    over TCP otherwise. Updates and drops only send the pks of the queried rows.
+    :param token: secret the server was started with, sent before the first request.
+    '''
+    def __init__(self, path: str = None, models=None, host: str = 'localhost', port: int = 5000, token: str = None):
+        self.path = path or f'{host}:{port}'
+        self.models = models
+        self.ids = count()
+        if path:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.socket.connect(path)
+            except OSError:
+                self.socket.close()
+                raise
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.stream = self.socket.makefile('rwb')
+        if token:
+            self.stream.write(auth_message(next(self.ids), token))
+            self.stream.flush()
+            line = self.stream.readline()
+            if not (accepted := bool(line) and json.loads(line)['status'] == 'ok'):
+                self.close()
+            assert accepted, f'The server on {self.path} refused the token.'
+
+    def request(self, op: str, model: str = None, kwargs: dict = None, pks: list = None):
+        self.stream.write(dump_message(
+            {'id': next(self.ids), 'op': op, 'model': model, 'kwargs': kwargs or {}, 'pks': pks or []}))
+        self.stream.flush()
+
+        assert (line := self.stream.readline()), f'The server on {self.path} closed the connection.'
+        response = json.loads(line)
+        assert response['status'] == 'ok', response['error']
+        return decode_result(response, self.models, model)
+
+    def call(self, command: str, **kwargs):
+        '''
+        Runs one of the extra commands the server was started with.
+        '''
+        return self.request(command, kwargs=kwargs)
+
+    def query(self, model_name: str, **kwargs) -> pd.DataFrame:
+        return self.request('query', model_name, kwargs)
+
+    def get(self, model_name: str, *args, **kwargs):
+        return self.request('get', model_name, kwargs, list(args))
+
+    def hydrate(self, model_name: str, **kwargs):
+        return self.request('hydrate', model_name, kwargs)
+
+    def explain(self, model_name: str, **kwargs) -> pd.DataFrame:
+        return self.request('explain', model_name, kwargs)
+
+    def create(self, model_name: str, **kwargs):
+        return self.request('create', model_name, kwargs)
+
+    def update(self, model_name: str, query: pd.DataFrame, **kwargs) -> pd.DataFrame:
+        return self.request('update', model_name, kwargs, query.pk.tolist())
+
+    def drop(self, model_name: str, query: pd.DataFrame, cascade: list[str, ...] = []):
+        return self.request('drop', model_name, {'cascade': cascade}, query.pk.tolist())
+
+    def archive(self, model_name: str, query: pd.DataFrame, cascade: list[str, ...] = []) -> int:
+        return self.request('archive', model_name, {'cascade': cascade}, query.pk.tolist())
+
+    def export(self, model_name: str, file_path: str, chunk_size: int = 10_000, file_format: str = None, **kwargs):
+        return self.request('export', model_name,
+                            {'file_path': file_path, 'chunk_size': chunk_size, 'file_format': file_format, **kwargs})
+
+    def import_file(self, model_name: str, file_path: str, chunk_size: int = 10_000, file_format: str = None):
+        return self.request('import_file', model_name,
+                            {'file_path': file_path, 'chunk_size': chunk_size, 'file_format': file_format})
+
+    def save(self):
+        return self.request('save')
+
+    def compact(self, model_name: str = None):
+        return self.request('compact', model_name)
+
+    def convert(self, storage):
+        return self.request('convert', kwargs={'storage': storage})
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getattr__(self, name: str):
+        # Tables are read whole, like attribute access on a Database.
+        if name[0] != '_' and self.__dict__.get('models') is not None and name in self.models:
+            return self.query(name)
+        raise AttributeError(f'{type(self).__name__} has no attribute {name}')
+
+
+class AsyncClient(Client):
+    '''
+    Client for asyncio code. Its methods return coroutines. Requests are pipelined: any number of them can be sent
+    before the first answer arrives, answers are matched to their request by id.
+    Use `await AsyncClient.open(...)` to connect.
+    '''
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, models=None, path: str = None):
+        self.path = path
+        self.models = models
+        self.ids = count()
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}  # id -> (model name, future)
+        self.receiving = asyncio.ensure_future(self.receive())
+
+    @classmethod
+    async def open(cls, path: str = None, models=None, host: str = 'localhost', port: int = 5000,
+                   token: str = None) -> 'AsyncClient':
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MESSAGE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MESSAGE_LIMIT)
+
+        if token:
+            writer.write(auth_message(0, token))
+            await writer.drain()
+            line = await reader.readline()
+            if not (accepted := bool(line) and json.loads(line)['status'] == 'ok'):
+                writer.close()
+            assert accepted, f'The server on {path or f"{host}:{port}"} refused the token.'
+        return cls(reader, writer, models, path or f'{host}:{port}')
+
+    async def receive(self):
+        try:
+            while line := await self.reader.readline():
+                response = json.loads(line)
+                model, future = self.pending.pop(response['id'], (None, None))
+                # Unknown ids belong to messages the server could not read, cancelled requests are done already.
+                if future is None or future.done():
+                    continue
+                if response['status'] == 'ok':
+                    future.set_result(decode_result(response, self.models, model))
+                else:
+                    future.set_exception(AssertionError(response['error']))
+        finally:
+            for _, future in self.pending.values():
+                if not future.done():
+                    future.set_exception(AssertionError(f'The server on {self.path} closed the connection.'))
+
+    async def request(self, op: str, model: str = None, kwargs: dict = None, pks: list = None):
+        assert not self.receiving.done(), f'The server on {self.path} closed the connection.'
+        message_id = next(self.ids)
+        self.pending[message_id] = (model, future := asyncio.get_running_loop().create_future())
+        self.writer.write(dump_message(
+            {'id': message_id, 'op': op, 'model': model, 'kwargs': kwargs or {}, 'pks': pks or []}))
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiving.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+def connect(path: str = None, models=None, host: str = 'localhost', port: int = 5000, token: str = None):
+    '''
+    Returns a client of the server listening on path, or host and port, or None when no server is running.
+    '''
+    try:
+        return Client(path, models, host, port, token)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
@@ -0,0 +1,98 @@
+from collections import Counter
+import zlib
+
+import numpy as np
+
+# Deflate only looks back 32 KiB, a larger dictionary would never be used.
+DICTIONARY_SIZE = 32 * 1024
+# Values the dictionary is trained on, spread over the column.
+TRAINING_VALUES = 10_000
+
+
+def train_dictionary(values: list, size: int = DICTIONARY_SIZE) -> bytes:
+    '''
+    Builds a shared dictionary from the lines repeated across values, such as markdown headers and the lines of code
+    snippets, the ones saving the most bytes last since deflate reaches them with the shortest distances. The space
+    left is filled with the text of the latest values.
+    '''
+    values = [value for value in values if value]
+    sample = [values[i] for i in np.linspace(0, len(values) - 1, min(len(values), TRAINING_VALUES), dtype=int)]
+    counts = Counter(line for value in sample for line in set(value.splitlines(keepends=True)))
+
+    picked, total = [], 0
+    for line, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2 or total >= size:
+            break
+        if total + len(encoded := line.encode()) <= size:
+            picked.append(encoded)
+            total += len(encoded)
+
+    filler = ''.join(reversed(sample)).encode()[:size - total]
+    return filler + b''.join(reversed(picked))
+
+
+def compress_values(values: list, dictionary: bytes) -> list:
+    '''
+    Compresses each text on its own with raw deflate and the shared dictionary, so any value can be read back without
+    the others. Missing values stay None.
+    '''
+    primed = zlib.compressobj(9, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    compressed = []
+    for value in values:
+        if value is None:
+            compressed.append(None)
+            continue
+        compressor = primed.copy()
+        compressed.append(compressor.compress(value.encode()) + compressor.flush())
+    return compressed
+
+
+def compress_column(values: list) -> tuple:
+    '''
+    Compresses the values of a column with a dictionary trained on it, or without one when the dictionary costs more
+    than it saves. Returns the compressed values and the dictionary used, or None when the result, dictionary
+    included, is not smaller than the text.
+    '''
+    raw_bytes = sum(len(value.encode()) for value in values if value is not None)
+    # The dictionary is stored once per column, past a small part of the column it costs more than it saves.
+    for dictionary in (train_dictionary(values, min(DICTIONARY_SIZE, raw_bytes // 16)), b''):
+        compressed = compress_values(values, dictionary)
+        if sum(len(value) for value in compressed if value is not None) + len(dictionary) < raw_bytes:
+            return compressed, dictionary
+    return None
+
+
+def decompress_values(values: list, dictionary: bytes) -> list:
+    return [None if value is None else zlib.decompressobj(-15, dictionary).decompress(value).decode()
+            for value in values]
+
+
+class CompressionStats:
+    '''
+    Sizes of the compressed columns of the files a storage backend wrote or read last and the time spent
+    decompressing them.
+    '''
+    def __init__(self):
+        self.columns = {}  # (model name, column) -> counters
+
+    def entry(self, model_name: str, column: str) -> dict:
+        return self.columns.setdefault((model_name, column), {
+            'raw_bytes': 0, 'bytes': 0, 'decoded_values': 0, 'decode_seconds': 0.0})
+
+    def record(self, model_name: str, column: str, raw_bytes: int, stored_bytes: int):
+        self.entry(model_name, column).update(raw_bytes=raw_bytes, bytes=stored_bytes)
+
+    def record_decode(self, model_name: str, column: str, values: int, seconds: float):
+        entry = self.entry(model_name, column)
+        entry['decoded_values'] += values
+        entry['decode_seconds'] += seconds
+
+    def stats(self) -> dict:
+        '''
+        Returns the counters of each compressed column by model, with the ratio of raw to stored bytes.
+        '''
+        stats = {}
+        for (model_name, column), counters in self.columns.items():
+            stats.setdefault(model_name, {})[column] = {
+                **counters, 'ratio': counters['raw_bytes'] / counters['bytes'] if counters['bytes'] else None}
+        return stats
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from .hydrate import CORE_TYPES
+
+
+# Datatypes numpy cannot hold missing values in and the pandas dtypes that can.
+nullable_dtypes = {int: 'Int64', bool: 'boolean'}
+
+
+class Computed:
+    '''
+    Columns derived from other fields of the same row. The function receives a frame with the depends_on columns and
+    returns a frame with the computed columns, so a whole table is computed at once.
+    Computed columns are read-only fields of the model that are never stored.
+    '''
+    def __init__(self, function, depends_on: tuple, columns: dict):
+        self.function = function
+        self.depends_on = depends_on
+        self.columns = columns
+
+    def compute(self, df: pd.DataFrame) -> pd.DataFrame:
+        result = self.function(df[list(self.depends_on)])
+        for column, datatype in self.columns.items():
+            if datatype in nullable_dtypes and result[column].isnull().any():
+                # Rows missing a value they depend on, such as notes without a timestamp, get a missing value too.
+                result[column] = result[column].astype(nullable_dtypes[datatype])
+            elif datatype in CORE_TYPES:
+                result[column] = result[column].astype(datatype)
+        return result[list(self.columns)]
+
+    def field(self, column: str) -> property:
+        '''
+        Returns the property computing the column for a single model instance.
+        '''
+        def fget(instance):
+            row = pd.DataFrame({field: [getattr(instance, field)] for field in self.depends_on})
+            return self.compute(row)[column].tolist()[0]
+
+        fget.__annotations__ = {'return': self.columns[column]}
+        return property(fget)
+
+
+def computed(*depends_on: str, **columns):
+    '''
+    Declares computed columns on a model from a function of the columns they depend on, e.g.
+
+        @computed('timestamp', year=int, month=int)
+        def _date(df):
+            dates = pd.to_datetime(df.timestamp, unit='s')
+            return pd.DataFrame({'year': dates.dt.year, 'month': dates.dt.month})
+
+    The keyword arguments name the columns and their datatypes. The decorated name should start with an underscore so
+    it is not a field itself.
+    '''
+    return lambda function: Computed(function, depends_on, columns)
@@ -1,3 +1,7 @@
+from .planner import column_masks
+from .word_index import search
+
+
 def handle_sort(kwargs, df):
     if '_sort' in kwargs.keys():
         if kwargs.get('_sort'):
@@ -20,17 +24,9 @@ def handle_limit(kwargs, df):
     return kwargs, df
 
 
+# Filters returning the matching rows of a frame, built from the masks used by the query planner.
 column_filters = {
-    'f': lambda df, column, value: df[df[column].str.contains(value, regex=False)],  # find in column
-    're': lambda df, column, value: df[df[column].str.contains(value)],  # regex in column
-    'eq': lambda df, column, value: df[df[column] == value],  # equals
-    'ne': lambda df, column, value: df[df[column] != value],  # not equal
-    'gt': lambda df, column, value: df[df[column] > value],  # greater than
-    'lt': lambda df, column, value: df[df[column] < value],  # less than
-    'ge': lambda df, column, value: df[df[column] >= value],  # greater than or equal to
-    'le': lambda df, column, value: df[df[column] <= value],  # less than or equal to
-    'max': lambda df, column, value: df[df[column] == df[column].max()],  # maximum (value is unused)
-    'min': lambda df, column, value: df[df[column] == df[column].min()],  # minimum (value is unused)
-    'in': lambda df, column, value: df[df[column].isin(value)],  # Find all values that are in a list
-    'nin': lambda df, column, value: df[~df[column].isin(value)],  # Find all values that are not in a list
+    operator: lambda df, column, value, mask=mask: df[mask(df[column], value).fillna(False).astype(bool)]
+    for operator, mask in column_masks.items()
 }
+column_filters['search'] = lambda df, column, value: search(df, column, value)  # Rows matching any word, best first
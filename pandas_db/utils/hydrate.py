@@ -1,5 +1,7 @@
 import pandas as pd
 
+from .schema import Schema
+
 CORE_TYPES = (str, int, float, bool)
 OUTER_TYPES = (list, dict)
 
@@ -88,81 +90,150 @@ def parse_datatype(db, datatype, value):
         raise Exception(f'{datatype} is not supported.')
 
 
-def hydrate(db, model_name: str, df: pd.DataFrame):
-    instance = db.models[model_name]()
-    for index in range(df.shape[0]):
-        record = df.iloc[index].to_dict()
-        for field, datatype, default_value in instance._schema.items():
-
-            if hasattr(datatype, '__origin__'):
-                outer_type = datatype.__origin__
-                inner_types = datatype.__args__
-                if outer_type is list:
-                    if result := next(dig(db, outer_type, inner_types, record[field]), None):
-                        record[field] = result
-
-                elif outer_type is dict:
-                    if result := next(dig(db, outer_type, inner_types, record[field]), None):
-                        record[field] = result
-
-            elif datatype in db.models:
-                if isinstance(record[field], dict):
-                    pk = record[field].get('pk', '')
-                else:
-                    pk = record[field]
-
-                if pk:
-                    record[field] = next(hydrate(db, datatype.__name__, db.query(datatype.__name__, pk=pk)), None)
-
-        yield record
-
-
-def dig(db, outer_type, inner_types, data):
-    record = None
-    if outer_type is list:
-        record = []
-
-        if data:
-            if hasattr(inner_types[0], '__origin__'):
-                for value in data:
-                    if hasattr(inner_types[0].__args__[0], '__origin__'):
-                        record.append(next(dig(db, inner_types[0].__origin__, inner_types[0].__args__, value), None))
-                    elif inner_types[0] in db.models:
-                        record.append(next(
-                            hydrate(db, inner_types[0].__name__, db.query(inner_types[0].__name__, pk=value)), None))
-                    else:
-                        record.append(value)
-
-            else:
-                for value in data:
-                    if inner_types[0] in db.models:
-                        if isinstance(value, str):
-                            record.append(next(
-                                hydrate(
-                                    db, inner_types[0].__name__, db.query(inner_types[0].__name__, pk=value)), None))
-                    else:
-                        record.append(value)
-
-    elif outer_type is dict:
-        record = {}
-        if data:
-            for key, value in data.items():
-                if hasattr(inner_types[1], '__origin__'):
-                    record.update({key: next(dig(db, inner_types[1].__origin__, inner_types[1].__args__, value), None)})
-                elif inner_types[1] in db.models:
-                    if isinstance(value, dict):
-                        pk = value.get('pk')
-                    else:
-                        pk = value
+def convert_value(db, datatype, value):
+    '''
+    Casts the elements of a stored list or dict to their annotated types, keeping all of them. Elements of list[X]
+    are all cast to X, those of list[X, Y] to the type at their position and the ones past the last to it.
+    Foreign keys become the pk they reference.
+    '''
+    if hasattr(datatype, '__origin__'):
+        inner_types = [inner_type for inner_type in datatype.__args__ if inner_type is not Ellipsis]
+        if datatype.__origin__ is list:
+            assert isinstance(value, list), f'Validation error: {value} is not of type {datatype}'
+            return [convert_value(db, inner_types[min(index, len(inner_types) - 1)], inner_value)
+                    for index, inner_value in enumerate(value)]
+
+        assert isinstance(value, dict), f'Validation error: {value} is not of type {datatype}'
+        return {inner_types[0](key): convert_value(db, inner_types[1], inner_value)
+                for key, inner_value in value.items()}
+
+    if value is None:
+        return None
+    if datatype in db.models:
+        return str(value.get('pk') if isinstance(value, dict) else value)
+    return datatype(value)
+
+
+def convert_column(db, datatype, series: pd.Series) -> pd.Series:
+    '''
+    Converts a whole column to datatype. Core types are cast at once, lists and dicts value by value.
+    Nulls are expected to have been filled beforehand, except in foreign key columns where they are kept.
+    Values that are not numbers fail the conversion to int or float instead of being replaced.
+    '''
+    if hasattr(datatype, '__origin__'):
+        return series.map(lambda value: convert_value(db, datatype, value))
 
-                    if pk:
-                        record.update(
-                            {key: next(
-                                hydrate(db, inner_types[1].__name__, db.query(inner_types[1].__name__, pk=pk)), None)})
-                else:
-                    record.update({key: value})
+    elif datatype in db.models:
+        return series.where(series.isnull(), series.astype(str))
+
+    elif datatype in (int, float):
+        numbers = pd.to_numeric(series, errors='coerce')
+        unparsed = numbers.isnull() & series.notnull()
+        assert not unparsed.any(), \
+            f'Unable to convert {unparsed.sum()} values of {series.name} to {datatype.__name__}, ' \
+            f'e.g. {series[unparsed].iloc[0]!r}'
+        return numbers.fillna(0).astype(datatype)
+
+    elif datatype in CORE_TYPES:
+        return series.astype(datatype)
 
     else:
-        raise TypeError(f'type({outer_type}) is not supported.')
+        raise Exception(f'{datatype} is not supported.')
+
 
-    yield record
+def collect_pks(db, datatype, value, pks: dict):
+    '''
+    Adds the foreign keys referenced by a value, including those nested in lists and dicts, to pks by model name.
+    '''
+    if not value:
+        return
+
+    if hasattr(datatype, '__origin__'):
+        inner_types = datatype.__args__
+        if datatype.__origin__ is list and isinstance(value, list):
+            for inner_value in value:
+                collect_pks(db, inner_types[0], inner_value, pks)
+
+        elif datatype.__origin__ is dict and isinstance(value, dict):
+            for inner_value in value.values():
+                collect_pks(db, inner_types[1], inner_value, pks)
+
+    elif datatype in db.models:
+        if pk := value.get('pk') if isinstance(value, dict) else value:
+            pks.setdefault(datatype.__name__, set()).add(pk)
+
+
+def stitch(db, datatype, value, fetched: dict):
+    '''
+    Replaces the foreign keys in a value with the hydrated records fetched for them.
+    '''
+    if hasattr(datatype, '__origin__'):
+        inner_types = datatype.__args__
+        if datatype.__origin__ is list:
+            if not value:
+                return []
+            if inner_types[0] in db.models:
+                # Only pks are hydrated, anything else in a list of foreign keys is left out.
+                return [stitch(db, inner_types[0], inner_value, fetched) for inner_value in value
+                        if isinstance(inner_value, str)]
+            return [stitch(db, inner_types[0], inner_value, fetched) for inner_value in value]
+
+        elif datatype.__origin__ is dict:
+            if not value:
+                return {}
+            return {key: stitch(db, inner_types[1], inner_value, fetched) for key, inner_value in value.items()}
+
+        raise TypeError(f'type({datatype.__origin__}) is not supported.')
+
+    elif datatype in db.models:
+        pk = value.get('pk') if isinstance(value, dict) else value
+        return fetched.get(datatype.__name__, {}).get(pk) if pk else None
+
+    return value
+
+
+def hydrate_records(db, model_name: str, records: list[dict], depth: int = None) -> list[dict]:
+    '''
+    Replaces the foreign keys of the records with Records of the rows they point to, in place.
+    Every foreign model is fetched once per level with a single pk__in lookup, down to depth levels.
+    Records referenced more than once are shared.
+    '''
+    if depth == 0 or not records:
+        return records
+
+    datatypes = Schema.of(db.models[model_name]).datatypes()
+    foreign_fields = {
+        field: datatype for field, datatype in datatypes.items()
+        if datatype in db.models or (hasattr(datatype, '__origin__') and datatype.__origin__ in OUTER_TYPES)
+    }
+
+    pks = {}
+    for record in records:
+        for field, datatype in foreign_fields.items():
+            collect_pks(db, datatype, record.get(field), pks)
+
+    fetched = {}
+    for foreign_model_name, foreign_pks in pks.items():
+        foreign_records = db.query(foreign_model_name, pk__in=list(foreign_pks)).to_dict('records')
+        hydrate_records(db, foreign_model_name, foreign_records, None if depth is None else depth - 1)
+        foreign_model = db.models[foreign_model_name]
+        fetched[foreign_model_name] = {record['pk']: foreign_model._from_row(record) for record in foreign_records}
+
+    for record in records:
+        for field, datatype in foreign_fields.items():
+            if field not in record:
+                continue
+            if datatype in db.models:
+                if record[field]:
+                    record[field] = stitch(db, datatype, record[field], fetched)
+            elif result := stitch(db, datatype, record[field], fetched):
+                record[field] = result
+
+    return records
+
+
+def hydrate(db, model_name: str, df: pd.DataFrame, depth: int = None):
+    '''
+    Yields the rows of df as Records with their foreign keys replaced by Records of the rows they point to.
+    '''
+    yield from map(db.models[model_name]._from_row, hydrate_records(db, model_name, df.to_dict('records'), depth))
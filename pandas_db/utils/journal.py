@@ -0,0 +1,107 @@
+import json
+import os
+
+import pandas as pd
+
+
+def to_json_value(value):
+    '''
+    Converts numpy scalars, Records and other non-native values so they can be written to the journal or sent.
+    '''
+    if hasattr(value, '_to_dict'):
+        return value._to_dict()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def append_journal(journal_file_path: str, entries: list) -> int:
+    '''
+    Appends journal entries as json lines and returns the new size of the journal file in bytes.
+    A last line cut short by a crash while appending is truncated first, so the entries start on a line of their own.
+    '''
+    with open(journal_file_path, 'ab+') as journal_file:
+        if size := journal_file.seek(0, os.SEEK_END):
+            journal_file.seek(size - 1)
+            if journal_file.read(1) != b'\n':
+                journal_file.truncate(complete_size(journal_file, size))
+        for entry in entries:
+            journal_file.write((json.dumps(entry, default=to_json_value) + '\n').encode())
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+        return journal_file.tell()
+
+
+def complete_size(journal_file, size: int) -> int:
+    '''
+    Returns the size of the journal up to the end of its last complete line.
+    '''
+    position = size
+    while position > 0:
+        start = max(position - (1 << 16), 0)
+        journal_file.seek(start)
+        if (newline := journal_file.read(position - start).rfind(b'\n')) != -1:
+            return start + newline + 1
+        position = start
+    return 0
+
+
+def read_journal(journal_file_path: str) -> list:
+    '''
+    Reads the entries of a journal file. A last line without a line break is ignored, it is either being appended by
+    another process or was cut short by a crash and will be truncated by the next append.
+    '''
+    entries = []
+    if os.path.isfile(journal_file_path):
+        with open(journal_file_path, 'rb') as journal_file:
+            for line in journal_file:
+                if not line.endswith(b'\n'):
+                    break
+                if line.strip():
+                    entries.append(json.loads(line))
+    return entries
+
+
+def replay_journal(df: pd.DataFrame, entries: list) -> pd.DataFrame:
+    '''
+    Applies create, update and drop entries on top of a snapshot. Rows are matched by pk.
+    Consecutive creates are concatenated in a single pass. Creates of rows already in the snapshot are skipped, they
+    were compacted into it by a save that stopped before it could remove the journal.
+    '''
+    created = []
+    for entry in entries:
+        if entry['op'] == 'create':
+            created.extend(entry['records'])
+            continue
+
+        if created:
+            df = append_created(df, created)
+            created = []
+
+        if df.empty:
+            continue
+
+        mask = df.pk.isin(entry['pks'])
+        if entry['op'] == 'update':
+            for field, value in entry['fields'].items():
+                if isinstance(value, (list, dict)):
+                    value = pd.Series([value] * mask.sum(), index=df.index[mask], dtype=object)
+                df.loc[mask, field] = value
+
+        elif entry['op'] == 'drop':
+            df = df[~mask]
+
+        else:
+            raise ValueError(f'Unknown journal operation "{entry["op"]}"')
+
+    if created:
+        df = append_created(df, created)
+
+    return df.reset_index(drop=True)
+
+
+def append_created(df: pd.DataFrame, records: list) -> pd.DataFrame:
+    created = pd.DataFrame(records)
+    if 'pk' in df.columns:
+        created = created[~created.pk.isin(df.pk)]
+    return pd.concat([df, created], ignore_index=True)
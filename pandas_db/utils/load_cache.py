@@ -0,0 +1,96 @@
+from hashlib import sha1
+import os
+import pickle
+import time
+
+import pandas as pd
+
+# Files modified this close to when their cache entry was built may have changed again without a new size or mtime,
+# on filesystems with coarse timestamps. Their content hash is checked instead.
+RACY_SECONDS = 2
+
+
+def file_hash(file_path: str = None, content: bytes = None) -> str:
+    '''
+    Returns the sha1 of a file, or of its content when it was already read.
+    '''
+    if content is not None:
+        return sha1(content).hexdigest()
+
+    digest = sha1()
+    with open(file_path, 'rb') as source_file:
+        while chunk := source_file.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_key(file_path: str, version: str = '') -> dict:
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+            'version': version, 'pandas': pd.__version__}
+
+
+def read_cache(cache_file_path: str, accept) -> tuple:
+    '''
+    Returns the key of a cache entry and its frame, which is only unpickled when accept(key) is true.
+    Returns None for the key when the entry is missing or unreadable, and None for the frame when it is not accepted.
+    '''
+    try:
+        with open(cache_file_path, 'rb') as cache_file:
+            cached_key = pickle.load(cache_file)
+            return cached_key, pickle.load(cache_file) if accept(cached_key) else None
+    except Exception:
+        return None, None
+
+
+def write_cache(cache_file_path: str, key: dict, df: pd.DataFrame):
+    '''
+    Writes the entry to a temporary file that then replaces it, so other processes never read half an entry.
+    '''
+    os.makedirs(os.path.dirname(cache_file_path) or '.', exist_ok=True)
+    temporary_file_path = f'{cache_file_path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_file_path, 'wb') as cache_file:
+            pickle.dump(key, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(df, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file_path, cache_file_path)
+    except OSError:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+
+
+def cached_read(cache_file_path: str, file_path: str, read, version: str = '') -> pd.DataFrame:
+    '''
+    Returns the frame parsed by read() from the content of file_path, from a pickle of the last parse when the file has
+    not changed. The file is unchanged when its path, size and mtime match the entry and it was not modified right
+    before the entry was built, or else when its content hash matches. Anything else that changes the parse, like the
+    datatypes, belongs in version. Entries are written by whichever process parses the file and can be deleted at any
+    time. Either file is read once.
+    '''
+    key = file_key(file_path, version)
+    hashes = {}
+
+    def accept(cached_key: dict) -> bool:
+        stored = {field: cached_key.get(field) for field in key}
+        if stored == key and cached_key['cached'] - key['mtime'] / 1e9 > RACY_SECONDS:
+            return True
+        if {**stored, 'size': None, 'mtime': None} != {**key, 'size': None, 'mtime': None}:
+            return False
+        hashes['hash'] = file_hash(file_path)
+        return cached_key['hash'] == hashes['hash']
+
+    cached_key, df = read_cache(cache_file_path, accept)
+    if df is not None:
+        # Stores the new size and mtime of a file matched by its hash, once it is old enough to be trusted by them.
+        if hashes and time.time() - key['mtime'] / 1e9 > RACY_SECONDS:
+            write_cache(cache_file_path, {**key, 'hash': cached_key['hash'], 'cached': time.time()}, df)
+        return df
+
+    cached = time.time()
+    with open(file_path, 'rb') as source_file:
+        content = source_file.read()
+    df = read(content)
+    # The file may have been replaced while it was read, the entry would not match its content then.
+    if file_key(file_path, version) == key:
+        write_cache(cache_file_path, {**key, 'hash': file_hash(content=content), 'cached': cached}, df)
+    return df
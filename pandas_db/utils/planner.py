@@ -0,0 +1,189 @@
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from .sorted_index import range_operators
+from .trigram_index import compile_pattern
+from .word_index import WordIndex
+
+column_masks = {
+    'f': lambda series, value: series.str.contains(value, regex=False),  # find in column
+    're': lambda series, value: series.str.contains(compile_pattern(value)),  # regex in column
+    'eq': lambda series, value: series == value,  # equals
+    'ne': lambda series, value: series != value,  # not equal
+    'gt': lambda series, value: series > value,  # greater than
+    'lt': lambda series, value: series < value,  # less than
+    'ge': lambda series, value: series >= value,  # greater than or equal to
+    'le': lambda series, value: series <= value,  # less than or equal to
+    'max': lambda series, value: series == series.max(),  # maximum (value is unused)
+    'min': lambda series, value: series == series.min(),  # minimum (value is unused)
+    'in': lambda series, value: series.isin(value),  # Find all values that are in a list
+    'nin': lambda series, value: ~series.isin(value),  # Find all values that are not in a list
+}
+
+# Relative cost per row and the expected fraction of rows kept by each operator.
+operator_costs = {'f': 20, 're': 50, 'search': 30, 'fk': 5}
+operator_selectivity = {'eq': 0.05, 'ne': 0.95, 'nin': 0.9, 'f': 0.1, 're': 0.1, 'search': 0.1, 'fk': 0.1}
+
+# These depend on the rows left by the other filters, so they always run last.
+barrier_operators = ('max', 'min')
+
+# Lookups comparing the pk stored in a foreign key column, they are answered by the column itself.
+foreign_key_operators = ('eq', 'ne', 'in', 'nin')
+
+
+class Step:
+    '''
+    A single filter of a query plan.
+    '''
+    def __init__(self, column: str, operator: str, value, foreign_model: str = None):
+        self.column = column
+        self.operator = operator
+        self.value = value
+        self.foreign_model = foreign_model
+        self.strategy = 'scan'
+        self.cost = operator_costs.get('fk' if foreign_model else operator, 1)
+        self.selectivity = operator_selectivity.get('fk' if foreign_model else operator, 0.33)
+        if operator == 'in':
+            self.selectivity = 0.05 * max(len(value), 1)
+        self.rows_in = None
+        self.rows_out = None
+        self.seconds = None
+
+    @property
+    def rank(self) -> float:
+        '''
+        Filters that discard the most rows for the least work run first.
+        '''
+        return (1 - min(self.selectivity, 1)) / self.cost
+
+    def to_dict(self) -> dict:
+        return {
+            'column': self.column,
+            'operator': self.operator,
+            'strategy': self.strategy,
+            'cost': self.cost,
+            'selectivity': self.selectivity,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'seconds': self.seconds,
+        }
+
+
+def plan(db, model_name: str, kwargs: dict, datatypes: dict) -> list[Step]:
+    steps = []
+    for field, value in kwargs.items():
+        column, operator = field.split('__', 1) if '__' in field else (field, 'eq')
+
+        # FK lookup.
+        if (foreign_model := datatypes.get(column)) in db.models and operator not in foreign_key_operators:
+            assert (
+                operator not in column_masks.keys()
+            ), f'Unspecified field in foreign key lookup. Did you mean "{column}__pk__{operator}=..."?'
+            steps.append(Step(column, operator, value, foreign_model=foreign_model.__name__))
+            continue
+
+        assert operator in column_masks or operator == 'search', f'Unknown lookup "{operator}" on field "{column}"'
+        step = Step(column, operator, value)
+        if column == 'pk' and operator in ('eq', 'in') and model_name not in db._unloaded:
+            step.strategy = 'index:pk'
+            step.selectivity = 0
+        elif (column == db.models[model_name]._ordinal and operator == 'eq' and isinstance(value, (int, np.integer))
+              and model_name not in db._unloaded):
+            # Row n is at position n - 1.
+            step.strategy = 'index:ordinal'
+            step.selectivity = 0
+        elif (operator in range_operators and (operator in barrier_operators or is_number(value))
+              and (index := db.get_index(model_name, column, 'sorted'))):
+            # The matching rows are counted by the binary search itself.
+            step.strategy = 'index:sorted'
+            start, end = index.bounds(operator, value)
+            step.selectivity = (end - start) / max(len(index), 1)
+        elif operator in ('f', 're') and (column, 'trigram') in db._index_specs.get(model_name, ()):
+            step.strategy = 'index:trigram'
+        elif operator in ('f', 'search') and db.get_index(model_name, column, 'word', build=False):
+            step.strategy = 'index:word'
+        if step.strategy != 'scan':
+            step.cost = 0.1 if step.strategy in ('index:pk', 'index:ordinal', 'index:sorted') else 1
+        steps.append(step)
+
+    return sorted(steps, key=lambda step: (step.operator in barrier_operators, -step.rank))
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def narrow(positions, mask) -> np.ndarray:
+    mask = np.asarray(pd.Series(mask).fillna(False), dtype=bool)
+    if positions is None:
+        return np.flatnonzero(mask)
+    return positions[mask]
+
+
+def column_at(df: pd.DataFrame, column: str, positions) -> pd.Series:
+    if positions is None:
+        return df[column]
+    return df[column].iloc[positions]
+
+
+def execute(db, model_name: str, df: pd.DataFrame, steps: list[Step], indexes: bool = True):
+    '''
+    Runs the plan over row positions and returns the positions of the matching rows in order.
+    Each filter only looks at the rows left by the previous ones and the plan stops as soon as nothing is left.
+    :param indexes: whether df is the model's table, the database's indexes are not used for other frames.
+    '''
+    positions = None
+    scores = None
+    for step in steps:
+        start = perf_counter()
+        step.rows_in = df.shape[0] if positions is None else positions.size
+
+        if step.foreign_model:
+            fk_series = db.query(step.foreign_model, **{step.operator: step.value}).pk
+            positions = narrow(positions, column_at(df, step.column, positions).isin(fk_series))
+
+        elif step.operator == 'search':
+            index = db.get_index(model_name, step.column, 'word') if indexes else None
+            if index is None:
+                subset = column_at(df, step.column, positions)
+                index = WordIndex.build(column_at(df, 'pk', positions), subset)
+            scores = index.search(step.value)
+            positions = narrow(positions, column_at(df, 'pk', positions).isin(scores.keys()))
+
+        elif step.strategy == 'index:ordinal':
+            found = np.arange(step.value - 1, step.value, dtype=np.int64)
+            found = found[(found >= 0) & (found < df.shape[0])]
+            positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+
+        elif step.strategy == 'index:sorted' and (positions is None or step.operator not in barrier_operators):
+            # max and min of the rows left by other filters are not the ones of the whole column.
+            found = db.get_index(model_name, step.column, 'sorted').positions(step.operator, step.value)
+            positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+
+        elif step.strategy == 'index:pk':
+            found = db.positions(model_name, step.value if step.operator == 'in' else [step.value])
+            positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+
+        else:
+            candidates = db.candidates(model_name, step.column, step.operator, step.value) if indexes else None
+            if candidates is not None:
+                positions = narrow(positions, column_at(df, 'pk', positions).isin(candidates))
+            if positions is None or positions.size:
+                positions = narrow(
+                    positions, column_masks[step.operator](column_at(df, step.column, positions), step.value))
+
+        step.rows_out = positions.size
+        step.seconds = perf_counter() - start
+        if not positions.size:
+            break
+
+    if positions is None:
+        positions = np.arange(df.shape[0])
+
+    if scores is not None:
+        ranks = -df.pk.iloc[positions].map(scores).to_numpy()
+        positions = positions[np.argsort(ranks, kind='stable')]
+
+    return positions
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from threading import Lock
+
+import pandas as pd
+
+
+def freeze(value):
+    '''
+    Returns a hashable version of a query value. Raises TypeError for values that cannot be made hashable.
+    '''
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (pd.Series, pd.Index)):
+        return tuple(freeze(item) for item in value.tolist())
+    hash(value)
+    return value
+
+
+class QueryCache:
+    '''
+    Least recently used cache of query results, bounded by the bytes of the cached frames. The rows of a result
+    point at the same objects as the table, so only their columns of values and pointers are counted.
+    Entries are dropped whenever the table of the model they query, or of a model their foreign key lookups read,
+    changes. Safe to use from several threads.
+    '''
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = OrderedDict()  # key -> (frame, bytes, model names)
+        self.keys = {}  # model name -> keys of the entries reading it
+        self.lock = Lock()
+
+    @staticmethod
+    def key(model_name: str, kwargs: dict) -> tuple:
+        '''
+        Normalizes a query so the order of its keyword arguments does not matter. Returns None when a value is not
+        hashable, such queries are not cached.
+        '''
+        try:
+            return model_name, tuple(sorted((field, freeze(value)) for field, value in kwargs.items()))
+        except TypeError:
+            return None
+
+    def get(self, key: tuple) -> pd.DataFrame:
+        with self.lock:
+            if (entry := self.entries.get(key)) is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, df: pd.DataFrame, foreign_models=()):
+        '''
+        :param foreign_models: names of the other models the query read, the entry is dropped when they change too.
+        '''
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.discard(key)
+            models = {key[0], *foreign_models}
+            self.entries[key] = (df, size, models)
+            for model_name in models:
+                self.keys.setdefault(model_name, set()).add(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def discard(self, key: tuple):
+        if (entry := self.entries.pop(key, None)) is not None:
+            self.size -= entry[1]
+            for model_name in entry[2]:
+                self.keys[model_name].discard(key)
+
+    def invalidate(self, model_name: str = None):
+        '''
+        Drops the entries of a model, or every entry if no model_name is given.
+        '''
+        with self.lock:
+            for model_keys in ([self.keys.get(model_name, ())] if model_name else list(self.keys.values())):
+                for key in list(model_keys):
+                    self.discard(key)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.size, 'max_bytes': self.max_bytes}
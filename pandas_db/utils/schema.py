@@ -1,15 +1,63 @@
+from hashlib import sha1
+import json
 from typing import get_type_hints
 
 from .resolve_default_value import resolve_default_value
 
 
+def type_name(datatype) -> str:
+    '''
+    Names a datatype independently of the module it was declared in.
+    '''
+    if datatype is Ellipsis:
+        return '...'
+    if hasattr(datatype, '__origin__'):
+        return f'{datatype.__origin__.__name__}[{", ".join(type_name(arg) for arg in datatype.__args__)}]'
+    return getattr(datatype, '__name__', str(datatype))
+
+
 class Schema:
+    '''
+    Field names, datatypes and default values of a model.
+    They are reflected once per model class and cached. Use Schema.of(model) to get the shared instance and
+    Schema.invalidate(model) after changing a model class at runtime.
+    '''
+    _cache = {}
+
     def __init__(self, instance):
         self.instance = instance
+        self.model = instance if isinstance(instance, type) else instance.__class__
+        self._datatypes = None
+        self._fields = None
+        self._default_values = None
+        self._computed = None
+        # Slotted record class generated by Model._record_class.
+        self.record_class = None
+
+    @classmethod
+    def of(cls, model) -> 'Schema':
+        if not isinstance(model, type):
+            model = model.__class__
+        if (schema := cls._cache.get(model)) is None:
+            schema = cls._cache[model] = cls(model)
+        return schema
+
+    @classmethod
+    def invalidate(cls, model=None):
+        '''
+        Drops the cached schema of a model, or of all models if none is given.
+        '''
+        if model is None:
+            cls._cache.clear()
+        else:
+            cls._cache.pop(model if isinstance(model, type) else model.__class__, None)
 
     def datatypes(self):
-        datatypes_dict = get_type_hints(self.instance.__class__)
-        datatypes_dict.update(self.instance.__annotations__)
+        if self._datatypes is not None:
+            return dict(self._datatypes)
+
+        datatypes_dict = get_type_hints(self.model)
+        datatypes_dict.update(self.model.__annotations__)
 
         result = {}
         for field in datatypes_dict.keys():
@@ -20,62 +68,84 @@ class Schema:
 
             result[field] = datatypes_dict[field]
 
-        for field in dir(self.instance):
+        for field in dir(self.model):
             if '__' in field:
                 continue
             if field[0] == '_':
                 continue
 
-
             # Gathering and formatting datatypes for properties
-            if hasattr(self.instance.__class__, field):
-                field_value = getattr(self.instance.__class__, field)
-                if hasattr(field_value, 'fget'):
-                    field_dtype = get_type_hints(field_value.fget)
-                    try:
-                        result.update({field: field_dtype['return']})
-                    except KeyError:
-                        raise Exception(
-                            f'Type hint requirement not met on {self.instance.__class__.__name__}.{field}')
-
-        return result
+            field_value = getattr(self.model, field)
+            if hasattr(field_value, 'fget'):
+                field_dtype = get_type_hints(field_value.fget)
+                try:
+                    result.update({field: field_dtype['return']})
+                except KeyError:
+                    raise Exception(
+                        f'Type hint requirement not met on {self.model.__name__}.{field}')
+
+        self._datatypes = result
+        return dict(result)
 
     def fields(self):
-        fields = dir(self.instance)
-        fields.extend(list(self.instance.__annotations__.keys()))
+        if self._fields is None:
+            fields = set(dir(self.model))
+            fields.update(self.model.__annotations__.keys())
+            self._fields = tuple(sorted(field for field in fields if '__' not in field and field[0] != '_'))
 
-        for field in fields:
-            if '__' in field:
-                continue
-            if field[0] == '_':
-                continue
-
-            yield field
+        yield from self._fields
 
     def default_values(self) -> dict:
-        datatypes = self.datatypes()
+        if self._default_values is None:
+            datatypes = self.datatypes()
 
-        default_values_dict = {}
-        for field in self.fields():
+            default_values_dict = {}
+            for field in self.fields():
 
-            if hasattr(self.instance.__class__, field):
-                value = getattr(self.instance.__class__, field)
+                if hasattr(self.model, field):
+                    value = getattr(self.model, field)
 
-            else:
-                value = resolve_default_value(datatypes.get(field))
+                else:
+                    value = resolve_default_value(datatypes.get(field))
 
-            if isinstance(value, property):
+                if isinstance(value, property):
 
-                # Allows default values to be set on properties.
-                if hasattr(self.instance.__class__, f'_{field}'):
-                    value = getattr(self.instance.__class__, f'_{field}')
+                    # Allows default values to be set on properties.
+                    if hasattr(self.model, f'_{field}'):
+                        value = getattr(self.model, f'_{field}')
 
-                else:
-                    value = resolve_default_value(datatypes.get(field))
+                    else:
+                        value = resolve_default_value(datatypes.get(field))
 
-            default_values_dict[field] = value
+                default_values_dict[field] = value
 
-        return default_values_dict
+            self._default_values = default_values_dict
+
+        # Lists and dicts are copied so instances do not share them.
+        return {
+            field: value.copy() if isinstance(value, (list, dict)) else value
+            for field, value in self._default_values.items()
+        }
+
+    def computed(self) -> dict:
+        '''
+        Returns the computed columns of the model by column name.
+        '''
+        from .computed import Computed
+
+        if self._computed is None:
+            self._computed = {}
+            for name in dir(self.model):
+                if isinstance(value := getattr(self.model, name), Computed):
+                    self._computed.update(dict.fromkeys(value.columns, value))
+        return self._computed
+
+    def fingerprint(self) -> dict:
+        '''
+        Returns the datatype name of every field and a hash of them, to tell whether stored data matches the model.
+        '''
+        datatypes = {field: type_name(datatype) for field, datatype in sorted(self.datatypes().items())}
+        return {'fingerprint': sha1(json.dumps(datatypes).encode()).hexdigest(), 'datatypes': datatypes}
 
     def items(self):
         try:
@@ -86,5 +156,4 @@ class Schema:
 
         except KeyError as error:
             raise KeyError(error)
-            raise Exception(f'Model {self.instance._name} field {field} has been set up incorrectly')
-
+            raise Exception(f'Model {self.model.__name__} field {field} has been set up incorrectly')
@@ -1,4 +1,15 @@
-from datetime import datetime
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+
+import pandas as pd
+
+from .client import connect, dump_message, MESSAGE_LIMIT
+
+logger = logging.getLogger(__name__)
 
 
 def on_connect(ws=None, sv=None, db=None):
@@ -16,6 +27,266 @@ def on_disconnect(ws=None, sv=None, db=None):
 
 
 def on_log(ws=None, sv=None, db=None, status=None, data=None, error=None):
-    # TODO - Make better
-    if sv.debug:
-        print(str(datetime.now()), f'[{status}]', data)
+    '''
+    Logs the requests a server answers. Failures are warnings, the other requests are only logged in debug mode.
+    '''
+    if status == 'error':
+        logger.warning('[%s] %s %s', status, data, error or '')
+    elif sv.debug:
+        logger.debug('[%s] %s', status, data)
+
+
+def encode_result(result) -> dict:
+    '''
+    Wraps the result of a database call in a json friendly message body.
+    '''
+    if isinstance(result, pd.DataFrame):
+        return {'type': 'frame', 'columns': list(result.columns), 'data': result.to_numpy().tolist()}
+    if hasattr(result, '_to_dict'):
+        return {'type': 'record', 'data': result._to_dict()}
+    return {'type': 'value', 'data': result}
+
+
+def error_message(message_id, error: Exception) -> bytes:
+    return dump_message({'id': message_id, 'status': 'error', 'error': f'{type(error).__name__}: {error}'})
+
+
+# Database calls a server answers. Updates, drops and archives receive the pks of the rows to change instead of a
+# frame.
+# Exports and imports use paths on the server's side, over TCP they are kept inside the database folder.
+operations = {
+    'query': lambda db, model, kwargs, pks: db.query(model, **kwargs),
+    'get': lambda db, model, kwargs, pks: db.get(model, *pks, **kwargs),
+    'hydrate': lambda db, model, kwargs, pks: list(db.hydrate(model, **kwargs)),
+    'explain': lambda db, model, kwargs, pks: db.explain(model, **kwargs),
+    'create': lambda db, model, kwargs, pks: db.create(model, **kwargs),
+    'update': lambda db, model, kwargs, pks: db.update(model, db.query(model, pk__in=pks), **kwargs),
+    'drop': lambda db, model, kwargs, pks: db.drop(model, db.query(model, pk__in=pks), **kwargs),
+    'archive': lambda db, model, kwargs, pks: db.archive(model, db.query(model, pk__in=pks), **kwargs),
+    'export': lambda db, model, kwargs, pks: db.export(model, **kwargs),
+    'import_file': lambda db, model, kwargs, pks: db.import_file(model, **kwargs),
+    'save': lambda db, model, kwargs, pks: db.save(),
+    'compact': lambda db, model, kwargs, pks: db.compact(model),
+    'convert': lambda db, model, kwargs, pks: db.convert(**kwargs),
+}
+read_operations = ('query', 'get', 'hydrate', 'explain', 'export')
+file_operations = ('export', 'import_file')
+
+
+class Server:
+    '''
+    Keeps a Database in memory and serves it to other processes, over a Unix socket when a path is given and over
+    TCP otherwise. Messages are json objects, one per line: {"id": ..., "op": ..., "model": ..., "kwargs": {...},
+    "pks": [...]}. Each is answered with {"id": ..., "status": "ok", "type": ..., "data": ...} or {"id": ...,
+    "status": "error", "error": ...}, in the order they finish, so clients can send requests without waiting.
+
+    Reads run concurrently in threads. Writes go through a single writer that takes every write waiting, up to
+    batch_size, waits for the running reads to finish, applies them in order and saves once for the whole batch.
+    Reads never run during a batch, so each one sees the database as it is between two batches.
+
+    The Unix socket can only be used by its owner. Over TCP clients first send {"id": ..., "op": "auth", "token": ...}
+    and the paths of exports and imports must be inside the database folder.
+    :param commands: extra operations by name, called with the database and the message kwargs. They run as writes.
+    :param token: secret clients must send before their first request. Required over TCP.
+    '''
+    def __init__(self, db, path: str = None, commands: dict = None, debug: bool = False, host: str = 'localhost',
+                 port: int = 5000, batch_size: int = 100, token: str = None):
+        assert path or token, 'A token is required to serve over TCP'
+        self.db = db
+        self.path = path
+        self.commands = commands or {}
+        self.debug = debug
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.token = token
+        self.reading = 0
+        self.writing = False
+        self.turn = None
+        self.writes = None
+
+    def execute(self, message: dict):
+        op = message.get('op')
+        model, kwargs, pks = message.get('model'), message.get('kwargs') or {}, message.get('pks') or []
+        if op in self.commands:
+            return self.commands[op](self.db, **kwargs)
+        assert op in operations, f'Unknown operation "{op}"'
+        if op in file_operations and not self.path:
+            kwargs = {**kwargs, 'file_path': self.data_file_path(kwargs.get('file_path'))}
+        return operations[op](self.db, model, kwargs, pks)
+
+    def data_file_path(self, file_path: str) -> str:
+        '''
+        Resolves a path sent over TCP against the database folder, which it may not leave.
+        '''
+        assert isinstance(file_path, str), 'A file_path is required'
+        root = os.path.realpath(self.db.path)
+        resolved = os.path.realpath(os.path.join(root, file_path))
+        assert os.path.commonpath([root, resolved]) == root, f'{file_path} is outside of the database folder'
+        return resolved
+
+    def answer(self, message: dict) -> bytes:
+        try:
+            response = {'id': message.get('id'), 'status': 'ok', **encode_result(self.execute(message))}
+            on_log(sv=self, db=self.db, status='ok', data=message)
+        except Exception as error:
+            on_log(sv=self, db=self.db, status='error', data=message, error=error)
+            return error_message(message.get('id'), error)
+        return dump_message(response)
+
+    def apply(self, messages: list) -> list[bytes]:
+        responses = [self.answer(message) for message in messages]
+        try:
+            self.db.save()
+        except Exception as error:
+            on_log(sv=self, db=self.db, status='error', data='save', error=error)
+            responses = [error_message(message.get('id'), error) for message in messages]
+        return responses
+
+    async def read(self, message: dict) -> bytes:
+        async with self.turn:
+            await self.turn.wait_for(lambda: not self.writing)
+            self.reading += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, self.answer, message)
+        finally:
+            async with self.turn:
+                self.reading -= 1
+                self.turn.notify_all()
+
+    async def write(self, message: dict) -> bytes:
+        await self.writes.put((message, response := asyncio.get_running_loop().create_future()))
+        return await response
+
+    async def write_batches(self):
+        while True:
+            batch = [await self.writes.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size and not self.writes.empty():
+                batch.append(self.writes.get_nowait())
+
+            # None is queued when the server stops, after the last writes.
+            if stopping := batch[-1] is None:
+                batch.pop()
+            if not batch:
+                return
+
+            async with self.turn:
+                # Set before waiting so new reads queue up behind the batch instead of starving it.
+                self.writing = True
+                await self.turn.wait_for(lambda: not self.reading)
+            try:
+                responses = await asyncio.get_running_loop().run_in_executor(
+                    None, self.apply, [message for message, _ in batch])
+            finally:
+                async with self.turn:
+                    self.writing = False
+                    self.turn.notify_all()
+
+            for (_, response), value in zip(batch, responses):
+                response.set_result(value)
+            if stopping:
+                return
+
+    async def handle_request(self, line: bytes, writer: asyncio.StreamWriter, sending: asyncio.Lock):
+        try:
+            message = json.loads(line)
+        except ValueError as error:
+            response = error_message(None, error)
+        else:
+            response = await (self.read(message) if message.get('op') in read_operations else self.write(message))
+
+        async with sending:
+            writer.write(response)
+            await writer.drain()
+
+    async def authenticate(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        '''
+        Checks the token sent in the first message of a connection and answers it.
+        '''
+        try:
+            message = json.loads(await reader.readline())
+        except (ValueError, ConnectionError):
+            return False
+        if not isinstance(message, dict):
+            return False
+
+        if authenticated := hmac.compare_digest(str(message.get('token')).encode(), self.token.encode()):
+            writer.write(dump_message({'id': message.get('id'), 'status': 'ok', **encode_result(None)}))
+        else:
+            on_log(sv=self, db=self.db, status='error', data='auth', error='Invalid token')
+            writer.write(error_message(message.get('id'), AssertionError('Invalid token')))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            return False
+        return authenticated
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.token and not await self.authenticate(reader, writer):
+            writer.close()
+            return
+
+        on_connect(ws=writer, sv=self, db=self.db)
+        sending = asyncio.Lock()
+        requests = set()
+        try:
+            while line := await reader.readline():
+                requests.add(request := asyncio.ensure_future(self.handle_request(line, writer, sending)))
+                request.add_done_callback(requests.discard)
+            if requests:
+                await asyncio.wait(requests)
+        except ConnectionError:
+            pass
+        finally:
+            on_disconnect(ws=writer, sv=self, db=self.db)
+            writer.close()
+
+    async def serve(self):
+        if self.path:
+            if (running := connect(self.path)) is not None:
+                running.close()
+            assert running is None, f'A server is already running on {self.path}'
+            # Left behind by a server that did not shut down cleanly.
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+        # Tables are loaded up front, lazy loading is not safe from concurrent reads.
+        for model in self.db.models:
+            self.db.has(model.__name__)
+
+        self.turn = asyncio.Condition()
+        self.writes = asyncio.Queue()
+        stopped = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signal_number, stopped.set)
+
+        if self.path:
+            # The socket is created owner only, no other user can connect between the bind and a chmod.
+            umask = os.umask(0o177)
+            try:
+                server = await asyncio.start_unix_server(self.handle_connection, path=self.path, limit=MESSAGE_LIMIT)
+            finally:
+                os.umask(umask)
+        else:
+            server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=MESSAGE_LIMIT)
+
+        writer = asyncio.ensure_future(self.write_batches())
+        try:
+            async with server:
+                await stopped.wait()
+        finally:
+            await self.writes.put(None)
+            await writer
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            self.db.save()
+
+    def run(self):
+        '''
+        Serves until the process is interrupted or terminated. In debug mode every request is logged, to stderr
+        unless logging was configured already.
+        '''
+        if self.debug:
+            logging.basicConfig(format='%(asctime)s %(message)s')
+            logger.setLevel(logging.DEBUG)
+        asyncio.run(self.serve())
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Lookups a sorted index answers with a binary search.
+range_operators = ('eq', 'gt', 'lt', 'ge', 'le', 'max', 'min')
+
+
+class SortedIndex:
+    '''
+    The row positions of a numeric column ordered by value, with the values in the same order. Range lookups, max,
+    min and sorting are answered with binary searches and slices instead of comparing the whole column.
+    Unlike the word and trigram indexes it is kept by row position, so the database moves it along when rows are
+    dropped. Missing values are kept after all the others, like pandas sorts them.
+    '''
+    # Maintained with add_rows(positions, values) and drop_rows(positions) instead of add(pk, value) and remove(pk).
+    positional = True
+
+    def __init__(self, order: np.ndarray, values: np.ndarray):
+        self.order = order
+        self.values = values
+
+    @classmethod
+    def build(cls, values):
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy()
+        # Stable, so equal values keep the order of their rows. Nearly sorted columns, like timestamps of notes added
+        # over time, sort in about linear time.
+        order = np.argsort(values, kind='stable')
+        return cls(order, values[order])
+
+    def __len__(self) -> int:
+        return self.order.size
+
+    @property
+    def valid(self) -> int:
+        '''
+        Number of values that are not missing, they come first.
+        '''
+        if self.values.dtype.kind != 'f':
+            return self.values.size
+        return int(np.searchsorted(self.values, np.nan))
+
+    def bounds(self, operator: str, value=None) -> tuple[int, int]:
+        '''
+        Returns the slice of the sorted values matching a lookup.
+        '''
+        values = self.values[:self.valid]
+        if not values.size:
+            return 0, 0
+        if operator == 'max':
+            return int(np.searchsorted(values, values[-1])), values.size
+        if operator == 'min':
+            return 0, int(np.searchsorted(values, values[0], side='right'))
+        if operator == 'eq':
+            return int(np.searchsorted(values, value)), int(np.searchsorted(values, value, side='right'))
+        if operator in ('gt', 'ge'):
+            return int(np.searchsorted(values, value, side='right' if operator == 'gt' else 'left')), values.size
+        return 0, int(np.searchsorted(values, value, side='left' if operator == 'lt' else 'right'))
+
+    def positions(self, operator: str, value=None) -> np.ndarray:
+        '''
+        Returns the sorted row positions matching a lookup.
+        '''
+        start, end = self.bounds(operator, value)
+        return np.sort(self.order[start:end])
+
+    def sort(self, positions: np.ndarray, rows: int, descending: bool = False, limit: int = None) -> np.ndarray:
+        '''
+        Orders the rows at positions by value, missing values last. Only limit rows are read when positions covers
+        the whole table of the given number of rows.
+        '''
+        numbers, missing = self.order[:self.valid], self.order[self.valid:]
+        if positions.size != rows:
+            kept = np.zeros(rows, dtype=bool)
+            kept[positions] = True
+            numbers, missing = numbers[kept[numbers]], missing[kept[missing]]
+
+        if descending:
+            numbers = numbers[::-1]
+        if limit is not None:
+            numbers, missing = numbers[:limit], missing[:max(limit - numbers.size, 0)]
+        return np.concatenate([numbers, missing])
+
+    def add_rows(self, positions, values):
+        '''
+        Inserts new rows, or moves existing rows whose value changed.
+        '''
+        positions = np.asarray(positions, dtype=np.int64)
+        if (existing := positions[positions < self.order.size]).size:
+            kept = ~np.isin(self.order, existing)
+            self.order, self.values = self.order[kept], self.values[kept]
+
+        if not positions.size:
+            return
+
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy()
+        if np.issubdtype(self.values.dtype, np.integer) and values.dtype.kind == 'f':
+            self.values = self.values.astype(values.dtype)
+        new_order = np.argsort(values, kind='stable')
+        positions, values = positions[new_order], values[new_order]
+
+        # Rows appended in order, the usual case, go at the end.
+        if not self.values.size or (self.valid == self.values.size and values[0] >= self.values[-1]):
+            self.order = np.concatenate([self.order, positions])
+            self.values = np.concatenate([self.values, values.astype(self.values.dtype, copy=False)])
+            return
+
+        slots = np.searchsorted(self.values, values, side='right')
+        self.order = np.insert(self.order, slots, positions)
+        self.values = np.insert(self.values, slots, values)
+
+    def drop_rows(self, positions):
+        '''
+        Removes dropped rows and moves the rows after them up.
+        '''
+        positions = np.sort(np.asarray(positions, dtype=np.int64))
+        kept = ~np.isin(self.order, positions)
+        self.order, self.values = self.order[kept], self.values[kept]
+        self.order = self.order - np.searchsorted(positions, self.order)
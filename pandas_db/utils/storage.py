@@ -0,0 +1,295 @@
+from importlib.util import find_spec
+from io import BytesIO
+import json
+import os
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from .compression import CompressionStats, compress_column, decompress_values
+from .journal import to_json_value
+from .schema import Schema
+
+# pyarrow.parquet is only imported once a parquet file is read or written, it is slow to import.
+HAS_PYARROW = find_spec('pyarrow') is not None
+
+
+def replace_file(file_path: str, write):
+    '''
+    Calls write with a temporary path next to file_path and moves the written file into place, so a crash while
+    writing never leaves a half written table behind.
+    '''
+    temporary_file_path = f'{file_path}.{os.getpid()}.tmp'
+    try:
+        write(temporary_file_path)
+        descriptor = os.open(temporary_file_path, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+        os.replace(temporary_file_path, file_path)
+    finally:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
+
+
+class JsonStorage:
+    '''
+    Stores each table as a pretty printed list of records.
+    '''
+    name = 'json'
+    extension = '.json'
+    # Whether reading a subset of the columns is cheaper than reading the whole table.
+    projection = False
+    # Whether parsing is slow enough that the database keeps a pickle of the parsed table, see utils.load_cache.
+    cache = True
+
+    def file_path(self, path: str, model_name: str) -> str:
+        return os.path.join(path, f'{model_name}{self.extension}')
+
+    def exists(self, path: str, model_name: str) -> bool:
+        return os.path.isfile(self.file_path(path, model_name))
+
+    def read(self, path: str, model_name: str, datatypes: dict, columns: list = None,
+             content: bytes = None) -> pd.DataFrame:
+        '''
+        Parses the table file, or its content when it was already read.
+        '''
+        source = self.file_path(path, model_name) if content is None else BytesIO(content)
+        df = pd.read_json(source, orient='records', convert_dates=False, dtype=datatypes)
+        if columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        return df
+
+    def write(self, path: str, model_name: str, df: pd.DataFrame, compressed=()):
+        # Json files stay readable text, compressed columns are only compressed by the columnar backends.
+        replace_file(self.file_path(path, model_name),
+                     lambda file_path: df.to_json(file_path, orient='records', indent=4))
+
+    def remove(self, path: str, model_name: str):
+        if self.exists(path, model_name):
+            os.remove(self.file_path(path, model_name))
+
+    def stats(self) -> dict:
+        '''
+        Returns the compression counters by model and column, none for json files which are never compressed.
+        '''
+        return {}
+
+
+class ColumnarStorage(JsonStorage):
+    '''
+    Stores each table column by column in a binary file. Uses parquet when pyarrow is installed, otherwise a numpy
+    archive where numeric columns are stored as arrays and text columns as a utf-8 heap with offsets.
+    Columns holding lists or dicts are stored as json text. The compressed columns of a model are compressed with
+    zstd by parquet, and in npz files as one deflate stream per value with a dictionary shared by the column, or as
+    plain text when that is smaller. They are decompressed when the table is read, reads of only some columns skip
+    them.
+    '''
+    name = 'columnar'
+    projection = True
+    cache = False
+
+    def __init__(self, engine: str = None):
+        if engine is None:
+            engine = 'parquet' if HAS_PYARROW else 'npz'
+        assert engine in ('parquet', 'npz'), f'Unknown columnar engine "{engine}"'
+        assert engine == 'npz' or HAS_PYARROW, 'The parquet engine requires pyarrow to be installed.'
+        self.engine = engine
+        self.extension = f'.{engine}'
+        self.compression = CompressionStats()
+
+    @staticmethod
+    def encode(df: pd.DataFrame, compressed=()) -> tuple[pd.DataFrame, dict, dict]:
+        '''
+        Converts object columns to text, or to compressed bytes for the compressed columns. Returns the encoded frame,
+        how each column was encoded and the dictionaries of the compressed columns.
+        '''
+        encoded = pd.DataFrame(index=df.index)
+        encodings = {}
+        dictionaries = {}
+        for column in df.columns:
+            series = df[column]
+            if series.dtype.kind in 'biuf':
+                encodings[column] = 'array'
+                encoded[column] = series
+            elif series.map(lambda value: isinstance(value, (list, dict))).any():
+                encodings[column] = 'json'
+                encoded[column] = series.map(
+                    lambda value: None if value is None else json.dumps(value, default=to_json_value))
+            elif column in compressed and (result := compress_column(
+                    [None if value is None else str(value) for value in series.where(series.notnull(), None)])):
+                encodings[column] = 'zlib'
+                encoded[column], dictionaries[column] = result
+            else:
+                encodings[column] = 'str'
+                encoded[column] = series.where(series.notnull(), None)
+        return encoded, encodings, dictionaries
+
+    @staticmethod
+    def decode(df: pd.DataFrame, encodings: dict) -> pd.DataFrame:
+        for column, encoding in encodings.items():
+            if encoding == 'json' and column in df.columns:
+                df[column] = df[column].map(lambda value: None if value is None else json.loads(value))
+        return df
+
+    def write(self, path: str, model_name: str, df: pd.DataFrame, compressed=()):
+        file_path = self.file_path(path, model_name)
+        df = df.reset_index(drop=True)
+        compressed = [column for column in compressed if column in df.columns]
+
+        if self.engine == 'parquet':
+            import pyarrow.parquet
+            encoded, encodings, _ = self.encode(df)
+            meta = json.dumps({'columns': list(encoded.columns), 'encodings': encodings, 'compressed': compressed})
+            table = pyarrow.Table.from_pandas(encoded, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'pandas_db': meta.encode()})
+            # Parquet compresses a column a page at a time, which does better than compressing each value.
+            replace_file(file_path, lambda temporary_file_path: pyarrow.parquet.write_table(
+                table, temporary_file_path,
+                compression={column: 'zstd' if column in compressed else 'snappy' for column in encoded.columns}))
+            self.record_parquet(model_name, pyarrow.parquet.ParquetFile(file_path).metadata, compressed)
+            return
+
+        encoded, encodings, dictionaries = self.encode(df, compressed)
+        # Compressed columns that did not get smaller are stored as text, their ratio is reported as 1.
+        compressed = [column for column in compressed if encodings[column] in ('zlib', 'str')]
+        for column in compressed:
+            raw_bytes = sum(len(str(value).encode()) for value in df[column] if value is not None)
+            self.compression.record(model_name, column, raw_bytes, raw_bytes if column not in dictionaries else sum(
+                len(value) for value in encoded[column] if value is not None) + len(dictionaries[column]))
+        meta = json.dumps({'columns': list(encoded.columns), 'encodings': encodings,
+                           'raw_bytes': {column: self.compression.entry(model_name, column)['raw_bytes']
+                                         for column in compressed}})
+
+        arrays = {'__meta__': np.frombuffer(meta.encode(), dtype=np.uint8)}
+        for column, encoding in encodings.items():
+            if encoding == 'array':
+                arrays[column] = encoded[column].to_numpy()
+                continue
+            if encoding == 'zlib':
+                arrays[f'{column}.dictionary'] = np.frombuffer(dictionaries[column], dtype=np.uint8)
+
+            values = [None if value is None else value if isinstance(value, bytes) else str(value).encode()
+                      for value in encoded[column]]
+            arrays[f'{column}.null'] = np.array([value is None for value in values], dtype=bool)
+            arrays[f'{column}.offsets'] = np.cumsum([0] + [len(value or b'') for value in values], dtype=np.int64)
+            arrays[f'{column}.heap'] = np.frombuffer(b''.join(value or b'' for value in values), dtype=np.uint8)
+
+        def write_npz(temporary_file_path: str):
+            # Written through a file handle so numpy does not append its own extension.
+            with open(temporary_file_path, 'wb') as npz_file:
+                np.savez(npz_file, **arrays)
+
+        replace_file(file_path, write_npz)
+
+    def read(self, path: str, model_name: str, datatypes: dict, columns: list = None) -> pd.DataFrame:
+        if self.engine == 'parquet':
+            import pyarrow.parquet
+            parquet_file = pyarrow.parquet.ParquetFile(self.file_path(path, model_name))
+            meta = json.loads(parquet_file.schema_arrow.metadata[b'pandas_db'])
+            columns = [column for column in meta['columns'] if columns is None or column in columns]
+            compressed = [column for column in meta.get('compressed', ()) if column in columns]
+            self.record_parquet(model_name, parquet_file.metadata, compressed)
+
+            # Compressed columns are read on their own to time their decompression.
+            start = perf_counter()
+            decompressed = parquet_file.read(columns=compressed).to_pandas() if compressed else None
+            for column in compressed:
+                self.compression.record_decode(model_name, column, parquet_file.metadata.num_rows,
+                                               (perf_counter() - start) / len(compressed))
+            df = parquet_file.read(columns=[column for column in columns if column not in compressed]).to_pandas()
+            if decompressed is not None:
+                df = pd.concat([df, decompressed], axis=1)[columns]
+            return self.decode(df, meta['encodings'])
+
+        with np.load(self.file_path(path, model_name), allow_pickle=False) as npz:
+            meta = json.loads(npz['__meta__'].tobytes())
+            data = {}
+            for column in meta['columns']:
+                if columns is not None and column not in columns:
+                    continue
+
+                if meta['encodings'][column] == 'array':
+                    data[column] = npz[column]
+                    continue
+
+                heap = npz[f'{column}.heap'].tobytes()
+                offsets = npz[f'{column}.offsets']
+                values = [
+                    None if null else heap[start:end]
+                    for null, start, end in zip(npz[f'{column}.null'], offsets[:-1], offsets[1:])
+                ]
+                if meta['encodings'][column] == 'zlib':
+                    dictionary = npz[f'{column}.dictionary'].tobytes()
+                    self.compression.record(model_name, column, meta['raw_bytes'][column], len(heap) + len(dictionary))
+                    start = perf_counter()
+                    data[column] = decompress_values(values, dictionary)
+                    self.compression.record_decode(model_name, column, len(values), perf_counter() - start)
+                else:
+                    if column in meta.get('raw_bytes', {}):
+                        self.compression.record(model_name, column, meta['raw_bytes'][column], len(heap))
+                    data[column] = [None if value is None else value.decode() for value in values]
+
+        return self.decode(pd.DataFrame(data), meta['encodings'])
+
+    def record_parquet(self, model_name: str, metadata, compressed: list):
+        # Parquet keeps the size of each column chunk before and after compression.
+        for column in compressed:
+            chunks = [metadata.row_group(group).column(position)
+                      for group in range(metadata.num_row_groups)
+                      for position in range(metadata.num_columns)
+                      if metadata.row_group(group).column(position).path_in_schema == column]
+            self.compression.record(model_name, column, sum(chunk.total_uncompressed_size for chunk in chunks),
+                                    sum(chunk.total_compressed_size for chunk in chunks))
+
+    def stats(self) -> dict:
+        '''
+        Returns the compression ratio and decompression time of the compressed columns of the files written or read.
+        '''
+        return self.compression.stats()
+
+
+STORAGE_BACKENDS = {
+    'json': lambda: JsonStorage(),
+    'columnar': lambda: ColumnarStorage(),
+    'parquet': lambda: ColumnarStorage('parquet'),
+    'npz': lambda: ColumnarStorage('npz'),
+}
+
+
+def get_storage(storage=None, path: str = None, models=()):
+    '''
+    Resolves a storage backend from a name or instance. When no storage is given, the backend is detected from the
+    files found in path, falling back to json.
+    '''
+    if storage is None:
+        for name in ('parquet', 'npz'):
+            if any(os.path.isfile(os.path.join(path, f'{model.__name__}.{name}')) for model in models):
+                storage = name
+                break
+        else:
+            storage = 'json'
+
+    if isinstance(storage, str):
+        assert storage in STORAGE_BACKENDS, f'Unknown storage "{storage}". Options are {list(STORAGE_BACKENDS)}'
+        return STORAGE_BACKENDS[storage]()
+
+    return storage
+
+
+def convert_storage(path: str, models, source, target):
+    '''
+    One shot conversion of every table in path from one storage backend to another.
+    The source files are removed once the target has been written.
+    '''
+    source = get_storage(source)
+    target = get_storage(target)
+    for model in models:
+        model_name = model.__name__
+        if source.exists(path, model_name):
+            df = source.read(path, model_name, Schema.of(model).datatypes())
+            target.write(path, model_name, df, model._compressed)
+            if source.file_path(path, model_name) != target.file_path(path, model_name):
+                source.remove(path, model_name)
@@ -0,0 +1,114 @@
+import json
+import os
+
+import pandas as pd
+
+from .journal import to_json_value
+from .schema import Schema
+from .storage import HAS_PYARROW
+
+# File formats by extension. Each is written and read a chunk at a time.
+STREAM_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet'}
+
+
+def stream_format(file_path: str, file_format: str = None) -> str:
+    if file_format is None:
+        file_format = STREAM_FORMATS.get(os.path.splitext(file_path)[1].lower())
+    assert file_format in STREAM_FORMATS.values(), \
+        f'Unknown format of "{file_path}". Options are {list(STREAM_FORMATS.values())}'
+    assert file_format != 'parquet' or HAS_PYARROW, 'The parquet format requires pyarrow to be installed.'
+    return file_format
+
+
+def encode_json_columns(df: pd.DataFrame, json_columns) -> pd.DataFrame:
+    '''
+    Writes list and dict values as json text, for formats without nested values.
+    '''
+    encode = json.JSONEncoder(default=to_json_value).encode
+    for column in json_columns:
+        if column in df.columns:
+            df[column] = df[column].map(lambda value: None if value is None else encode(value))
+    return df
+
+
+def write_chunks(file_path: str, chunks, file_format: str = None, json_columns=()) -> int:
+    '''
+    Writes an iterable of frames to one file, one chunk at a time. Returns the number of rows written.
+    :param json_columns: columns holding lists or dicts, written as json text in csv and parquet files.
+    '''
+    file_format = stream_format(file_path, file_format)
+    rows = 0
+    writer = None
+    with open(file_path, 'wb') if file_format == 'parquet' else open(file_path, 'w', newline='') as stream_file:
+        for chunk in chunks:
+            if file_format == 'jsonl':
+                chunk.to_json(stream_file, orient='records', lines=True, default_handler=to_json_value)
+            elif file_format == 'csv':
+                encode_json_columns(chunk, json_columns).to_csv(stream_file, header=not rows, index=False)
+            else:
+                import pyarrow
+                import pyarrow.parquet
+                table = pyarrow.Table.from_pandas(encode_json_columns(chunk, json_columns), preserve_index=False)
+                if writer is None:
+                    # Columns that are empty in the first chunk hold text in the later ones.
+                    schema = pyarrow.schema([
+                        field.with_type(pyarrow.string()) if pyarrow.types.is_null(field.type) else field
+                        for field in table.schema])
+                    writer = pyarrow.parquet.ParquetWriter(stream_file, schema)
+                writer.write_table(table.cast(writer.schema))
+            rows += chunk.shape[0]
+
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def json_fields(model) -> list:
+    return [field for field, datatype in Schema.of(model).datatypes().items()
+            if datatype in (list, dict) or hasattr(datatype, '__origin__')]
+
+
+def text_fields(db, model) -> list:
+    return [field for field, datatype in Schema.of(model).datatypes().items()
+            if datatype is str or datatype in db.models]
+
+
+def parse_chunk(db, model, df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Undoes what a file format changed in a chunk written by write_chunks: json text goes back to lists and dicts,
+    empty foreign keys to None and numbers to the field's type when nothing is lost. Anything else is left for
+    validation to report.
+    '''
+    datatypes = Schema.of(model).datatypes()
+    nested = json_fields(model)
+    for column in df.columns:
+        datatype = datatypes.get(column)
+        series = df[column]
+        if column in nested:
+            df[column] = series.map(lambda value: json.loads(value) if isinstance(value, str) else value)
+        elif datatype in db.models:
+            df[column] = series.where(series.notnull() & series.ne(''), None)
+        elif datatype is float and series.dtype.kind in 'iu':
+            df[column] = series.astype(float)
+        elif datatype is int and series.dtype.kind == 'f' and series.notnull().all() and (series % 1 == 0).all():
+            df[column] = series.astype(int)
+    return df
+
+
+def read_chunks(file_path: str, chunk_size: int = 10_000, file_format: str = None, text_columns=()):
+    '''
+    Yields the rows of a csv, jsonl or parquet file as frames of up to chunk_size rows.
+    :param text_columns: columns read as text from csv files instead of guessing their type.
+    '''
+    file_format = stream_format(file_path, file_format)
+    if file_format == 'csv':
+        # Empty cells are kept as empty strings, the database fills the other nulls itself.
+        yield from pd.read_csv(file_path, chunksize=chunk_size, dtype={column: str for column in text_columns},
+                               keep_default_na=False)
+    elif file_format == 'jsonl':
+        with pd.read_json(file_path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False) as reader:
+            yield from reader
+    else:
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(file_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
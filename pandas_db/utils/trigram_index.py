@@ -0,0 +1,186 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str) -> re.Pattern:
+    '''
+    Compiles a regex once and reuses it across queries.
+    '''
+    return re.compile(pattern)
+
+
+def trigrams(text) -> np.ndarray:
+    '''
+    Returns the distinct utf-8 byte trigrams of a string packed into integers.
+    '''
+    if not isinstance(text, str):
+        return np.array([], dtype=np.int32)
+    buffer = np.frombuffer(text.encode(), dtype=np.uint8).astype(np.int32)
+    return np.unique((buffer[:-2] << 16) | (buffer[1:-1] << 8) | buffer[2:])
+
+
+@lru_cache(maxsize=256)
+def required_literals(pattern: str) -> tuple[str, ...]:
+    '''
+    Returns the runs of literal characters every match of the pattern must contain.
+    Returns an empty tuple when nothing can be required, e.g. for case insensitive patterns.
+    Literals of case insensitive groups are left out.
+    '''
+    parsed = sre_parse.parse(pattern)
+    if parsed.state.flags & re.IGNORECASE:
+        return ()
+
+    literals = []
+
+    def walk(items):
+        run = ''
+        for opcode, argument in items:
+            if opcode is sre_parse.LITERAL:
+                run += chr(argument)
+                continue
+
+            literals.append(run)
+            run = ''
+            # A group with an inline case insensitive flag, e.g. (?i:...), may match its literals in any case.
+            if opcode is sre_parse.SUBPATTERN and not argument[1] & re.IGNORECASE:
+                walk(argument[-1])
+        literals.append(run)
+
+    walk(parsed)
+    return tuple(literal for literal in literals if len(literal) >= 3)
+
+
+# Rows added or removed since the postings were built after which they are merged into the numpy arrays, at least
+# this many and at least an eighth of the rows.
+MERGE_SIZE = 1024
+
+
+class TrigramIndex:
+    '''
+    Posting lists from every three byte sequence to the rows containing it.
+    Narrows substring and regex lookups down to the rows containing all required trigrams.
+    Postings built in bulk are kept as sorted numpy arrays, rows added afterwards go to a small delta and removed
+    rows are only marked as dead, until there are enough of them to merge everything back into the arrays.
+    '''
+    def __init__(self):
+        self.pks = []  # document id -> pk
+        self.ids = {}  # pk -> document id
+        self.dead = set()
+        self.merged = 0  # documents in the numpy postings
+        self.codes = np.array([], dtype=np.int32)  # sorted distinct trigrams of the bulk postings
+        self.offsets = np.array([0], dtype=np.int64)
+        self.documents = np.array([], dtype=np.int32)
+        self.delta = {}  # trigram -> set of document ids added after the build
+
+    @classmethod
+    def build(cls, pks, texts):
+        index = cls()
+        index.pks = list(pks)
+        index.ids = {pk: document for document, pk in enumerate(index.pks)}
+        index.merged = len(index.pks)
+
+        encoded = [text.encode() if isinstance(text, str) else b'' for text in texts]
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int32)
+        if buffer.size < 3:
+            return index
+
+        document_ids = np.repeat(np.arange(len(encoded), dtype=np.int64), [len(text) for text in encoded])
+        # Drop trigrams that would span two documents.
+        within = document_ids[:-2] == document_ids[2:]
+        codes = ((buffer[:-2] << 16) | (buffer[1:-1] << 8) | buffer[2:])[within]
+        index.set_postings(np.unique((codes.astype(np.int64) << 32) | document_ids[:-2][within]))
+        return index
+
+    def set_postings(self, keys: np.ndarray):
+        '''
+        Stores postings given as sorted distinct trigram << 32 | document keys.
+        '''
+        self.codes, starts = np.unique((keys >> 32).astype(np.int32), return_index=True)
+        self.offsets = np.append(starts, keys.size)
+        self.documents = (keys & 0xFFFFFFFF).astype(np.int32)
+
+    def merge(self):
+        '''
+        Moves the delta into the numpy postings and drops the dead rows, numbering the rows left from 0 again.
+        '''
+        codes = [np.repeat(self.codes.astype(np.int64), np.diff(self.offsets))]
+        documents = [self.documents.astype(np.int64)]
+        for code, delta_documents in self.delta.items():
+            codes.append(np.full(len(delta_documents), code, dtype=np.int64))
+            documents.append(np.fromiter(delta_documents, dtype=np.int64, count=len(delta_documents)))
+        codes, documents = np.concatenate(codes), np.concatenate(documents)
+
+        live = np.ones(len(self.pks), dtype=bool)
+        live[list(self.dead)] = False
+        renumbered = np.cumsum(live) - 1
+        kept = live[documents]
+        self.set_postings(np.unique((codes[kept] << 32) | renumbered[documents[kept]]))
+
+        self.pks = [pk for pk, alive in zip(self.pks, live.tolist()) if alive]
+        self.ids = {pk: document for document, pk in enumerate(self.pks)}
+        self.merged = len(self.pks)
+        self.delta = {}
+        self.dead = set()
+
+    def merge_if_needed(self):
+        if len(self.pks) - self.merged + len(self.dead) > max(MERGE_SIZE, len(self.ids) // 8):
+            self.merge()
+
+    def add(self, pk, text):
+        self.remove(pk)
+        document = len(self.pks)
+        self.pks.append(pk)
+        self.ids[pk] = document
+        for code in trigrams(text).tolist():
+            self.delta.setdefault(code, set()).add(document)
+        self.merge_if_needed()
+
+    def remove(self, pk):
+        if (document := self.ids.pop(pk, None)) is not None:
+            self.dead.add(document)
+            self.merge_if_needed()
+
+    def postings(self, code: int) -> np.ndarray:
+        position = np.searchsorted(self.codes, code)
+        if position < self.codes.size and self.codes[position] == code:
+            documents = self.documents[self.offsets[position]:self.offsets[position + 1]]
+        else:
+            documents = np.array([], dtype=np.int32)
+
+        if code in self.delta:
+            documents = np.union1d(documents, np.fromiter(self.delta[code], dtype=np.int32))
+        return documents
+
+    def candidates(self, substring: str):
+        '''
+        Returns the pks that may contain substring, or None if it is too short to narrow by.
+        '''
+        if (codes := trigrams(substring)).size == 0:
+            return None
+
+        postings = sorted((self.postings(code) for code in codes.tolist()), key=len)
+        result = postings[0]
+        for documents in postings[1:]:
+            if not result.size:
+                break
+            result = np.intersect1d(result, documents, assume_unique=True)
+
+        return {self.pks[document] for document in result.tolist() if document not in self.dead}
+
+    def regex_candidates(self, pattern: str):
+        '''
+        Returns the pks that may match the pattern, or None if the pattern has no literals to narrow by.
+        '''
+        result = None
+        for literal in required_literals(pattern):
+            pks = self.candidates(literal)
+            result = pks if result is None else result & pks
+        return result
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from .assert_datatypes import assert_datatypes
+from .schema import Schema
+
+
+class ValidationReport:
+    '''
+    Row positions that do not match their field's datatype, by field.
+    '''
+    def __init__(self, model_name: str = ''):
+        self.model_name = model_name
+        self.errors = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def add(self, field: str, datatype, positions: np.ndarray):
+        if positions.size:
+            self.errors[field] = (datatype, positions)
+
+    def raise_for_errors(self):
+        assert self.ok, str(self)
+
+    def __str__(self):
+        lines = [f'{self.model_name} validation failed:']
+        for field, (datatype, positions) in self.errors.items():
+            lines.append(f'Field({field}): type({datatype}) does not match {positions.size} rows '
+                         f'at positions {positions[:10].tolist()}{"..." if positions.size > 10 else ""}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return str(self) if self.errors else f'{self.model_name} validation passed.'
+
+
+def invalid_positions(db, datatype, series: pd.Series) -> np.ndarray:
+    '''
+    Returns the positions of the values in series that do not match datatype, following the rules of
+    assert_datatypes. Core types and foreign keys are checked for the whole column at once, lists and dicts are
+    checked per value.
+    '''
+    if hasattr(datatype, '__origin__'):
+        invalid = ~series.map(type).eq(datatype.__origin__).to_numpy()
+
+        def check(value) -> bool:
+            try:
+                assert_datatypes(db, datatype, value, '')
+                return True
+            except (AssertionError, TypeError):
+                return False
+
+        candidates = np.flatnonzero(~invalid)
+        checked = np.array([check(value) for value in series.iloc[candidates]], dtype=bool)
+        invalid[candidates[~checked]] = True
+        return np.flatnonzero(invalid)
+
+    if datatype in db.models:
+        valid = series.isnull() | series.map(type).eq(str)
+        return np.flatnonzero(~valid.to_numpy())
+
+    kind = series.dtype.kind
+    if (datatype is int and kind in 'iu') or (datatype is float and kind == 'f') or (datatype is bool and kind == 'b'):
+        return np.array([], dtype=np.int64)
+    if kind != 'O':
+        return np.arange(series.size)
+
+    return np.flatnonzero(~series.map(type).eq(datatype).to_numpy())
+
+
+def validate_frame(db, model, df: pd.DataFrame) -> ValidationReport:
+    '''
+    Validates every column of df that is a field of model in one pass per column.
+    '''
+    report = ValidationReport(model.__name__)
+    datatypes = Schema.of(model).datatypes()
+    for column in df.columns:
+        if column in datatypes:
+            report.add(column, datatypes[column], invalid_positions(db, datatypes[column], df[column]))
+    return report
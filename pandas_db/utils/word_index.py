@@ -0,0 +1,128 @@
+import math
+import re
+from collections import Counter
+
+import pandas as pd
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text) -> list[str]:
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def word_trigrams(word: str) -> set[str]:
+    return {word[start:start + 3] for start in range(len(word) - 2)}
+
+
+class WordIndex:
+    '''
+    Inverted index from lower case words to the pks of the rows containing them.
+    Ranks multi word searches with BM25.
+    '''
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # word -> {pk: term frequency}
+        self.vocabulary = {}  # trigram -> indexed words containing it, so substrings do not scan every word
+        self.words = {}  # pk -> distinct words
+        self.lengths = {}  # pk -> number of words
+        self.total_length = 0
+
+    @classmethod
+    def build(cls, pks, texts):
+        index = cls()
+        for pk, text in zip(pks, texts):
+            index.add(pk, text)
+        return index
+
+    def add(self, pk, text):
+        if pk in self.lengths:
+            self.remove(pk)
+
+        words = tokenize(text)
+        frequencies = Counter(words)
+        for word, frequency in frequencies.items():
+            if word not in self.postings:
+                self.postings[word] = {}
+                for trigram in word_trigrams(word):
+                    self.vocabulary.setdefault(trigram, set()).add(word)
+            self.postings[word][pk] = frequency
+        self.words[pk] = tuple(frequencies)
+        self.lengths[pk] = len(words)
+        self.total_length += len(words)
+
+    def remove(self, pk):
+        if (length := self.lengths.pop(pk, None)) is None:
+            return
+
+        self.total_length -= length
+        for word in self.words.pop(pk):
+            documents = self.postings[word]
+            del documents[pk]
+            if not documents:
+                del self.postings[word]
+                for trigram in word_trigrams(word):
+                    self.vocabulary[trigram].discard(word)
+                    if not self.vocabulary[trigram]:
+                        del self.vocabulary[trigram]
+
+    def search(self, query: str) -> dict:
+        '''
+        Returns the BM25 score of every pk containing at least one word of the query.
+        '''
+        scores = {}
+        if not self.lengths:
+            return scores
+
+        average_length = self.total_length / len(self.lengths) or 1
+        for word in set(tokenize(query)):
+            documents = self.postings.get(word, {})
+            idf = math.log(1 + (len(self.lengths) - len(documents) + 0.5) / (len(documents) + 0.5))
+            for pk, frequency in documents.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[pk] / average_length)
+                scores[pk] = scores.get(pk, 0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return scores
+
+    def candidates(self, substring: str):
+        '''
+        Returns the pks that may contain substring, a superset of the exact matches.
+        Each word of the substring must be part of some indexed word of the row. Only the indexed words sharing all
+        its trigrams are checked, words shorter than three characters are checked against every indexed word.
+        Returns None when the substring has no words to narrow by.
+        '''
+        if not (words := set(tokenize(substring))):
+            return None
+
+        result = None
+        for word in words:
+            if trigrams := word_trigrams(word):
+                vocabularies = sorted((self.vocabulary.get(trigram, set()) for trigram in trigrams), key=len)
+                vocabulary = vocabularies[0].intersection(*vocabularies[1:])
+            else:
+                vocabulary = self.postings
+            pks = set()
+            for indexed_word in vocabulary:
+                if word in indexed_word:
+                    pks.update(self.postings[indexed_word])
+            result = pks if result is None else result & pks
+            if not result:
+                break
+
+        return result
+
+
+def search(df: pd.DataFrame, column: str, value: str, index: WordIndex = None) -> pd.DataFrame:
+    '''
+    Returns the rows matching any word of value, best match first.
+    Builds a temporary index over the column when none is given.
+    '''
+    if index is None:
+        index = WordIndex.build(df.pk, df[column])
+
+    scores = index.search(value)
+    df = df[df.pk.isin(scores.keys())]
+    return df.iloc[(-df.pk.map(scores)).argsort(kind='stable')]
@@ -0,0 +1,102 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pandas_db import Database, Model, ModelManager  # noqa: E402
+from pandas_db.utils import column_filters  # noqa: E402
+from pandas_db.utils.planner import barrier_operators  # noqa: E402
+
+
+class Author(Model):
+    name: str
+
+
+class Book(Model):
+    title: str
+    author: Author
+    pages: int
+    rating: float
+    tags: list[str]
+
+
+models = ModelManager(Author, Book)
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    '''
+    Opens a database in a temporary folder, the same folder every time so a test can reopen what it saved.
+    '''
+    def make_db(**kwargs) -> Database:
+        db = Database(**{'models': models, 'path': f'{tmp_path}/', 'archive_path': f'{tmp_path}/archive/', **kwargs})
+        db.migrate()
+        return db
+    return make_db
+
+
+@pytest.fixture
+def library(make_db):
+    db = make_db()
+    tolkien = db.create('Author', name='Tolkien')
+    herbert = db.create('Author', name='Herbert')
+    db.create('Book', title='The Hobbit', author=tolkien.pk, pages=310, rating=4.3, tags=['fantasy'])
+    db.create('Book', title='The Silmarillion', author=tolkien.pk, pages=365, rating=3.9, tags=['fantasy', 'myth'])
+    db.create('Book', title='Dune', author=herbert.pk, pages=412, rating=4.6, tags=['scifi'])
+    db.save()
+    return db
+
+
+WORDS = ['dragon', 'moon', 'river', 'Dragon', 'king', 'ring', 'sea', 'star', 'war', 'peace']
+
+
+def random_book(rng: random.Random, number: int) -> dict:
+    return {'title': f'{" ".join(rng.choices(WORDS, k=3))} {number}', 'pages': rng.choice([80, 120, 200, 310, 450]),
+            'rating': round(rng.uniform(1, 5), 1)}
+
+
+@pytest.fixture
+def shelf(make_db):
+    '''
+    A table of generated books, for comparing indexed lookups with a scan.
+    '''
+    db = make_db()
+    db.bulk_create('Book', [random_book(random.Random(number), number) for number in range(300)])
+    return db
+
+
+@pytest.fixture
+def change_books():
+    '''
+    Updates, drops and creates books, so the indexes built before have to follow.
+    '''
+    def change_books(db):
+        rng = random.Random(1)
+        books = db.query('Book')
+        db.update('Book', books.iloc[rng.sample(range(books.shape[0]), 40)], title='dragon moon 1000', pages=450)
+        db.drop('Book', db.query('Book', pages=200).iloc[::2])
+        db.create('Book', **random_book(rng, 1001))
+        db.bulk_create('Book', [random_book(rng, number) for number in range(1002, 1050)])
+    return change_books
+
+
+@pytest.fixture
+def assert_matches_scan():
+    '''
+    Checks that each query returns the rows a plain pandas scan of the table finds.
+    '''
+    def scan(df, lookups: dict) -> set:
+        # max and min depend on the rows left by the other filters, they are applied last.
+        for lookup, value in sorted(lookups.items(), key=lambda item: item[0].split('__')[1] in barrier_operators):
+            column, operator = lookup.split('__')
+            df = column_filters[operator](df, column, value)
+        return set(df.pk)
+
+    def assert_matches_scan(db, queries: list):
+        df = db.query('Book')
+        for lookups in queries:
+            assert set(db.query('Book', **lookups).pk) == scan(df, lookups), lookups
+    return assert_matches_scan
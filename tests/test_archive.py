@@ -0,0 +1,25 @@
+def test_drop_archive_result(make_db):
+    db = make_db(journal=True)
+    author = db.create('Author', name='Tolkien')
+    for number in range(10):
+        db.create('Book', title=f'p{number}', author=author.pk, pages=number, rating=1.0, tags=[])
+    db.save()
+    db.archive('Book', db.query('Book', pages__lt=3))
+
+    db.drop('Book', db.query('Book', title='p9', _include_archive=True))
+    db.save()
+    titles = sorted(db.query('Book').title)
+    assert titles == [f'p{number}' for number in range(3, 9)]
+    assert sorted(make_db(journal=True).query('Book').title) == titles
+
+
+def test_include_archive(make_db):
+    db = make_db()
+    author = db.create('Author', name='Tolkien')
+    for number in range(6):
+        db.create('Book', title=f'p{number}', author=author.pk, pages=number, rating=1.0, tags=[str(number)])
+    db.archive('Book', db.query('Book', pages__ge=4))
+    assert db.query('Book').shape[0] == 4
+    found = make_db().query('Book', pages__gt=2, _include_archive=True, _sort='pages')
+    assert found.title.tolist() == ['p3', 'p4', 'p5']
+    assert found.tags.tolist() == [['3'], ['4'], ['5']]
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pandas_db import Database, Model, ModelManager
+
+
+class Note(Model):
+    title: str
+    note: str
+
+    _compressed = ('note',)
+
+
+models = ModelManager(Note)
+
+
+def markdown_note(rng: random.Random, number: int) -> str:
+    lines = rng.sample(['# Summary', '## Next steps', '- [ ] review the pull request', '```python',
+                        'import pandas as pd', '```', '> quoted from the meeting', '- [x] done'], 5)
+    return '\n'.join([f'# Note {number}', *lines, f'Written on day {rng.randint(1, 365)}.'])
+
+
+def open_db(tmp_path, storage: str) -> Database:
+    db = Database(models=models, path=f'{tmp_path}/', storage=storage)
+    db.migrate()
+    return db
+
+
+@pytest.mark.parametrize('storage', ['npz', 'parquet'])
+def test_compressed_columns_round_trip(tmp_path, storage):
+    rng = random.Random(0)
+    db = open_db(tmp_path, storage)
+    db.bulk_create('Note', [{'title': f'Note {number}', 'note': markdown_note(rng, number)} for number in range(500)])
+    db.create('Note', title='Empty', note='')
+    db.save()
+    assert db.storage.stats()['Note']['note']['ratio'] > 2
+
+    reopened = open_db(tmp_path, storage)
+    # Reading only some columns leaves the compressed ones alone.
+    assert reopened.query('Note', title='Note 3', _fields=['title']).shape[0] == 1
+    assert reopened.storage.stats().get('Note', {}).get('note', {}).get('decoded_values', 0) == 0
+
+    pd.testing.assert_frame_equal(reopened.Note, db.Note)
+    assert reopened.storage.stats()['Note']['note']['decoded_values'] == 501
+
+
+def test_small_tables_are_not_made_bigger(tmp_path):
+    db = open_db(tmp_path, 'npz')
+    db.bulk_create('Note', [{'title': 'Groceries', 'note': 'milk, eggs'}, {'title': 'Call', 'note': 'call Sam'}])
+    db.save()
+    assert db.storage.stats()['Note']['note']['ratio'] == 1
+
+    with np.load(tmp_path / 'Note.npz') as npz:
+        assert 'note.dictionary' not in npz.files
+    reopened = open_db(tmp_path, 'npz')
+    pd.testing.assert_frame_equal(reopened.Note, db.Note)
+    assert reopened.storage.stats()['Note']['note']['ratio'] == 1
+
+
+def test_json_storage_has_no_compression_stats(tmp_path):
+    db = open_db(tmp_path, 'json')
+    db.create('Note', title='Groceries', note='milk, eggs')
+    db.save()
+    assert db.storage.stats() == {}
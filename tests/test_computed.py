@@ -0,0 +1,44 @@
+import json
+
+import pandas as pd
+
+from pandas_db import Database, Model, ModelManager, computed
+
+
+class Entry(Model):
+    text: str
+    timestamp: float
+
+    _archive_by = 'timestamp'
+
+    @computed('timestamp', year=int, leap=bool)
+    def _date(df):
+        dates = pd.to_datetime(df.timestamp, unit='s', utc=True)
+        return pd.DataFrame({'year': dates.dt.year, 'leap': dates.dt.is_leap_year})
+
+
+models = ModelManager(Entry)
+
+
+def test_null_dependency_loads(tmp_path):
+    with open(tmp_path / 'Entry.json', 'w') as table_file:
+        json.dump([{'pk': 'a', 'text': 'dated', 'timestamp': 1704067200.0},
+                   {'pk': 'b', 'text': 'undated', 'timestamp': None}], table_file)
+
+    db = Database(models=models, path=f'{tmp_path}/')
+    db.migrate()
+    entries = db.query('Entry')
+    assert entries.year.tolist()[0] == 2024
+    assert db.query('Entry', text='undated').shape[0] == 1
+
+
+def test_archived_null_dependency(tmp_path):
+    db = Database(models=models, path=f'{tmp_path}/', archive_path=f'{tmp_path}/archive/')
+    db.migrate()
+    db.create('Entry', text='dated', timestamp=1704067200.0)
+    db.create('Entry', text='undated')
+    db.Entry.loc[db.Entry.text == 'undated', 'timestamp'] = None
+    db.archive('Entry', db.query('Entry'))
+    archived = db.query('Entry', _include_archive=True)
+    assert sorted(archived.text) == ['dated', 'undated']
+    assert archived.loc[archived.text == 'dated', 'year'].tolist() == [2024]
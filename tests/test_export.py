@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from pandas_db import Database
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl'])
+def test_export_and_import_round_trip(library, tmp_path, extension):
+    library.bulk_create('Book', [{'title': f'Book, "{number}"', 'author': None, 'pages': number, 'rating': 0.5,
+                                  'tags': [f'tag {number}', 'x,y'] if number % 2 else []} for number in range(7)])
+    file_path = str(tmp_path / f'books.{extension}')
+    assert library.export('Book', file_path, chunk_size=3) == 10
+    assert library.export('Author', str(tmp_path / f'authors.{extension}'), chunk_size=3) == 2
+
+    (tmp_path / 'copy').mkdir()
+    db = Database(models=library.models, path=f'{tmp_path}/copy/')
+    db.migrate()
+    assert db.import_file('Author', str(tmp_path / f'authors.{extension}'), chunk_size=3) == 2
+    assert db.import_file('Book', file_path, chunk_size=3) == 10
+    pd.testing.assert_frame_equal(db.Book, library.Book)
+    pd.testing.assert_frame_equal(db.Author, library.Author)
+
+    # Rows already in the table are skipped.
+    assert db.import_file('Book', file_path, chunk_size=4) == 0
+    assert Database(models=library.models, path=f'{tmp_path}/copy/').Book.shape[0] == 10
+
+
+def test_export_a_query(library, tmp_path):
+    file_path = str(tmp_path / 'books.jsonl')
+    assert library.export('Book', file_path, chunk_size=1, author=library.query('Author', name='Tolkien').pk.iloc[0]) == 2
+
+    (tmp_path / 'copy').mkdir()
+    db = Database(models=library.models, path=f'{tmp_path}/copy/')
+    db.migrate()
+    assert db.import_file('Book', file_path) == 2
+    assert sorted(db.Book.title) == ['The Hobbit', 'The Silmarillion']
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from pandas_db import Database, Model, ModelManager
+from pandas_db.utils import Schema
+
+
+def test_unparseable_numbers_are_not_replaced(tmp_path, make_db):
+    books = [{'pk': 'a', 'title': 'Dune', 'author': None, 'pages': '412', 'rating': 4.6, 'tags': []},
+             {'pk': 'b', 'title': 'Emma', 'author': None, 'pages': 'many', 'rating': 4.0, 'tags': []}]
+    with open(tmp_path / 'Book.json', 'w') as table_file:
+        json.dump(books, table_file)
+
+    with pytest.raises(AssertionError, match='Unable to convert 1 values of pages to int'):
+        make_db().Book
+    with open(tmp_path / 'Book.json') as table_file:
+        assert json.load(table_file) == books
+
+
+def test_legacy_lists_keep_all_values(tmp_path, make_db):
+    books = [{'pk': 'a', 'title': 'Dune', 'author': None, 'pages': 412, 'rating': 4.6,
+              'tags': ['scifi', 'classic', 'x']},
+             {'pk': 'b', 'title': 'Emma', 'author': None, 'pages': 474, 'rating': 4.0, 'tags': []}]
+    with open(tmp_path / 'Book.json', 'w') as table_file:
+        json.dump(books, table_file)
+
+    assert make_db().Book.tags.tolist() == [['scifi', 'classic', 'x'], []]
+    with open(tmp_path / 'Book.json') as table_file:
+        assert [book['tags'] for book in json.load(table_file)] == [['scifi', 'classic', 'x'], []]
+
+
+class Publisher(Model):
+    name: str
+
+
+class Writer(Model):
+    name: str
+    publisher: Publisher
+
+
+class Novel(Model):
+    title: str
+    writer: Writer
+    editors: list[Writer]
+    roles: dict[str, Writer]
+
+
+def hydrate_row(db, model_name: str, record: dict) -> dict:
+    '''
+    Resolves the foreign keys of one record with a lookup per key, the way hydrate worked before it was batched.
+    '''
+    def fetch(datatype, pk):
+        df = db.query(datatype.__name__, pk=pk)
+        return hydrate_row(db, datatype.__name__, df.iloc[0].to_dict()) if df.shape[0] else None
+
+    for field, datatype in Schema.of(db.models[model_name]).datatypes().items():
+        if datatype in db.models and record[field]:
+            record[field] = fetch(datatype, record[field])
+        elif getattr(datatype, '__origin__', None) is list and record[field]:
+            record[field] = [fetch(datatype.__args__[0], pk) for pk in record[field]]
+        elif getattr(datatype, '__origin__', None) is dict and record[field]:
+            record[field] = {key: fetch(datatype.__args__[1], pk) for key, pk in record[field].items()}
+    return record
+
+
+def plain(value):
+    if hasattr(value, '_to_dict'):
+        return plain(value._to_dict())
+    if isinstance(value, dict):
+        return {key: plain(inner_value) for key, inner_value in value.items()}
+    if isinstance(value, list):
+        return [plain(inner_value) for inner_value in value]
+    return value
+
+
+def test_bulk_hydration_matches_per_row_lookups(tmp_path):
+    db = Database(models=ModelManager(Publisher, Writer, Novel), path=f'{tmp_path}/')
+    db.migrate()
+    publishers = [db.create('Publisher', name=f'publisher {number}').pk for number in range(2)]
+    writers = [db.create('Writer', name=f'writer {number}', publisher=publishers[number % 2]).pk
+               for number in range(4)]
+    writers.append(db.create('Writer', name='unpublished').pk)
+    db.create('Novel', title='Dune', writer=writers[0], editors=[writers[1], writers[2]],
+              roles={'translator': writers[3], 'illustrator': writers[0]})
+    db.create('Novel', title='Emma', writer=writers[4], editors=[], roles={'translator': 'missing'})
+    db.create('Novel', title='Solaris', writer=None, editors=[writers[3], 'missing'], roles={})
+
+    expected = [hydrate_row(db, 'Novel', db.Novel.iloc[index].to_dict()) for index in range(db.Novel.shape[0])]
+    hydrated = [plain(record) for record in db.hydrate('Novel')]
+    assert hydrated == expected
+    assert hydrated[0]['writer']['publisher']['name'] == 'publisher 0'
+    assert hydrated[0]['roles']['translator']['name'] == 'writer 3'
+    assert hydrated[2]['editors'] == [expected[0]['roles']['translator'], None]
+
+    shallow = list(db.hydrate('Novel', _depth=1))
+    assert shallow[0].writer.publisher == publishers[0]
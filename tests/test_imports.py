@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_helpers_are_not_hidden_by_their_modules():
+    # A fresh interpreter, as the helpers of this one may already have been resolved.
+    script = '''
+import inspect
+import pandas_db.utils.hydrate, pandas_db.utils.computed, pandas_db.utils.assert_datatypes
+import pandas_db.utils as utils
+from pandas_db import computed
+from pandas_db.utils import hydrate, assert_datatypes
+assert all(not inspect.ismodule(helper) for helper in (computed, hydrate, assert_datatypes))
+assert all(not inspect.ismodule(getattr(utils, name)) for name in utils.__all__)
+'''
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True)
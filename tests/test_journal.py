@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+
+def test_truncated_last_entry_is_ignored(make_db):
+    db = make_db(journal=True)
+    db.create('Author', name='Tolkien')
+    db.save()
+    db.create('Author', name='Herbert')
+    db.save()
+
+    journal_file_path = db.journal_path('Author')
+    with open(journal_file_path, 'rb') as journal_file:
+        content = journal_file.read()
+    with open(journal_file_path, 'wb') as journal_file:
+        journal_file.write(content[:-10])
+
+    # Reading leaves the line alone, another process may still be appending it.
+    db = make_db(journal=True)
+    assert db.query('Author').name.tolist() == ['Tolkien']
+    with open(journal_file_path, 'rb') as journal_file:
+        assert journal_file.read() == content[:-10]
+
+    db.create('Author', name='Asimov')
+    db.save()
+    assert make_db(journal=True).query('Author').name.tolist() == ['Tolkien', 'Asimov']
+
+
+def test_journaled_new_table_is_not_converted_again(make_db):
+    db = make_db(journal=True)
+    db.bulk_create('Book', [{'title': 'Dune', 'pages': 412, 'rating': 4.6, 'tags': ['scifi', 'classic']}])
+    db.save()
+    assert make_db(journal=True).query('Book').tags.tolist() == [['scifi', 'classic']]
+
+
+def test_compaction_stopped_before_removing_the_journal(make_db, monkeypatch):
+    db = make_db(journal=True)
+    db.create('Author', name='Tolkien')
+    db.save()
+
+    def crash(file_path):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'remove', crash)
+        with pytest.raises(KeyboardInterrupt):
+            db.compact('Author')
+    assert os.path.isfile(db.journal_path('Author'))
+
+    assert make_db(journal=True).query('Author').name.tolist() == ['Tolkien']
+
+
+@pytest.mark.parametrize('storage', ['json', 'npz', 'parquet'])
+def test_failed_write_keeps_the_table(make_db, monkeypatch, storage):
+    db = make_db(storage=storage)
+    db.create('Author', name='Tolkien')
+    db.save()
+
+    db.create('Author', name='Herbert')
+
+    def disk_full(source, target):
+        raise OSError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'replace', disk_full)
+        with pytest.raises(OSError):
+            db.save()
+
+    assert make_db(storage=storage).query('Author').name.tolist() == ['Tolkien']
+    assert not [name for name in os.listdir(db.path) if name.endswith('.tmp')]
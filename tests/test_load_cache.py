@@ -0,0 +1,95 @@
+import builtins
+import os
+import time
+from collections import Counter
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import pandas_db.utils.load_cache as load_cache
+from pandas_db.utils import cached_read
+
+
+@pytest.fixture
+def source(tmp_path):
+    file_path = tmp_path / 'table.csv'
+    file_path.write_text('a,b\n1,x\n2,y\n')
+    # Old enough for its size and mtime to be trusted.
+    os.utime(file_path, (time.time() - 60, time.time() - 60))
+    return str(file_path)
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    '''
+    Counts the files opened by name and the parses of the source.
+    '''
+    counts = Counter()
+    original_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        opened_file = original_open(file, *args, **kwargs)
+        if isinstance(file, (str, os.PathLike)):
+            counts[os.path.basename(file)] += 1
+        return opened_file
+
+    monkeypatch.setattr(builtins, 'open', counting_open)
+    return counts
+
+
+def read(counts):
+    def read(content: bytes) -> pd.DataFrame:
+        counts['parsed'] += 1
+        return pd.read_csv(BytesIO(content))
+    return read
+
+
+def test_miss_then_hit(tmp_path, source, reads):
+    cache_file_path = str(tmp_path / '.cache' / 'table.pkl')
+    df = cached_read(cache_file_path, source, read(reads))
+    assert (reads['table.csv'], reads['parsed'], reads['table.pkl']) == (1, 1, 0)
+    assert os.path.isfile(cache_file_path)
+
+    reads.clear()
+    pd.testing.assert_frame_equal(cached_read(cache_file_path, source, read(reads)), df)
+    assert reads == {'table.pkl': 1}
+
+
+def test_recent_file_is_checked_by_hash(tmp_path, source, reads, monkeypatch):
+    monkeypatch.setattr(load_cache, 'RACY_SECONDS', 3600)
+    cache_file_path = str(tmp_path / 'table.pkl')
+    cached_read(cache_file_path, source, read(reads))
+
+    reads.clear()
+    cached_read(cache_file_path, source, read(reads))
+    assert reads == {'table.csv': 1, 'table.pkl': 1}
+
+    # Same size and mtime, different content.
+    stat = os.stat(source)
+    with open(source, 'w') as source_file:
+        source_file.write('a,b\n1,x\n3,y\n')
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    reads.clear()
+    assert cached_read(cache_file_path, source, read(reads)).a.tolist() == [1, 3]
+    assert reads['parsed'] == 1
+
+
+def test_changed_version_or_file_parses_again(tmp_path, source, reads):
+    cache_file_path = str(tmp_path / 'table.pkl')
+    cached_read(cache_file_path, source, read(reads), version='1')
+    assert cached_read(cache_file_path, source, read(reads), version='2').shape == (2, 2)
+    assert reads['parsed'] == 2
+
+    with open(source, 'a') as source_file:
+        source_file.write('3,z\n')
+    assert cached_read(cache_file_path, source, read(reads), version='2').shape == (3, 2)
+    assert reads['parsed'] == 3
+
+
+def test_unreadable_entry_is_replaced(tmp_path, source, reads):
+    cache_file_path = tmp_path / 'table.pkl'
+    cache_file_path.write_bytes(b'garbage')
+    assert cached_read(str(cache_file_path), source, read(reads)).shape == (2, 2)
+    assert cached_read(str(cache_file_path), source, read(reads)).shape == (2, 2)
+    assert reads['parsed'] == 1
@@ -0,0 +1,30 @@
+def test_foreign_key_equals_pk(library):
+    tolkien = library.query('Author', name='Tolkien').pk.iloc[0]
+    assert sorted(library.query('Book', author=tolkien).title) == ['The Hobbit', 'The Silmarillion']
+    assert library.query('Book', author__eq=tolkien).shape[0] == 2
+    assert library.query('Book', author__ne=tolkien).title.tolist() == ['Dune']
+
+
+def test_foreign_key_in_pks(library):
+    pks = library.query('Author').pk.tolist()
+    assert library.query('Book', author__in=pks).shape[0] == 3
+    assert library.query('Book', author__nin=pks[:1]).title.tolist() == ['Dune']
+
+
+def test_foreign_key_join(library):
+    assert library.query('Book', author__name='Herbert').title.tolist() == ['Dune']
+    assert library.query('Book', author__name__f='Tolk').shape[0] == 2
+
+
+def test_replaced_table_is_indexed_again(shelf, assert_matches_scan):
+    shelf.create_index('Book', 'title', 'trigram')
+    shelf.create_index('Book', 'pages', 'sorted')
+    queries = [{'title__f': 'dragon'}, {'pages__ge': 200}, {'pages__max': True}]
+    assert_matches_scan(shelf, queries)
+    pk = shelf.Book.pk.iloc[0]
+    assert shelf.get('Book', pk) is not None
+
+    shelf['Book'] = shelf.Book.iloc[::-3].reset_index(drop=True)
+    assert_matches_scan(shelf, queries)
+    assert shelf.get('Book', pk) is None
+    assert shelf.get('Book', shelf.Book.pk.iloc[5]).title == shelf.Book.title.iloc[5]
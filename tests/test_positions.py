@@ -0,0 +1,46 @@
+import pandas as pd
+
+from pandas_db import Database, Model, ModelManager
+
+
+class Page(Model):
+    text: str
+    page: int
+
+    _ordinal = 'page'
+
+
+models = ModelManager(Page)
+
+
+def assert_lookups_match_a_scan(db):
+    df = db.Page
+    assert df.page.tolist() == list(range(1, df.shape[0] + 1))
+    for position in range(df.shape[0]):
+        pk = df.pk.iloc[position]
+        assert db.get('Page', pk).text == df.text.iloc[position]
+    pks = df.pk.iloc[::3].tolist() + ['missing']
+    pd.testing.assert_frame_equal(db.query('Page', pk__in=pks), df[df.pk.isin(pks)])
+
+
+def test_positions_follow_changes(tmp_path):
+    db = Database(models=models, path=f'{tmp_path}/')
+    db.migrate()
+    db.bulk_create('Page', [{'text': f'page {number}'} for number in range(20)])
+    # The map is built by this first lookup and kept up to date afterwards.
+    assert_lookups_match_a_scan(db)
+
+    db.create('Page', text='created')
+    assert_lookups_match_a_scan(db)
+
+    db.update('Page', db.query('Page', text='page 4'), pk='renamed')
+    assert db.get('Page', 'renamed').text == 'page 4'
+    assert_lookups_match_a_scan(db)
+
+    db.drop('Page', db.query('Page', text__in=['page 0', 'page 7', 'page 8']))
+    assert db.get('Page', 'renamed').page == 4
+    assert_lookups_match_a_scan(db)
+
+    db.drop('Page', db.query('Page', text='created'))
+    assert_lookups_match_a_scan(db)
+    assert db.get('Page', 'missing') is None
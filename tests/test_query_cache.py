@@ -0,0 +1,19 @@
+def test_foreign_key_lookup_invalidated(make_db):
+    db = make_db(query_cache=10_000_000)
+    tolkien = db.create('Author', name='Tolkien')
+    db.create('Book', title='The Hobbit', author=tolkien.pk, pages=310, rating=4.3, tags=[])
+    assert db.query('Book', author__name='Tolkien').shape[0] == 1
+    assert db.query('Book', author__name='Tolkien').shape[0] == 1
+    assert db.query_cache.stats()['hits'] == 1
+
+    db.update('Author', db.query('Author', pk=tolkien.pk), name='J. R. R. Tolkien')
+    assert db.query('Book', author__name='Tolkien').empty
+    assert db.query('Book', author__name='J. R. R. Tolkien').shape[0] == 1
+
+
+def test_cached_results_are_copies(make_db):
+    db = make_db(query_cache=10_000_000)
+    db.create('Author', name='Tolkien')
+    first = db.query('Author', name='Tolkien')
+    first['name'] = 'changed'
+    assert db.query('Author', name='Tolkien').name.tolist() == ['Tolkien']
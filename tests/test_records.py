@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+
+def test_records_share_their_schema_and_have_no_dict(library):
+    Book = library.models.Book
+    record_class = Book._record_class()
+    assert record_class is Book._record_class()
+    assert record_class._schema is Book._record_class()._schema
+    book = record_class(title='Dune', pages=412)
+    assert not hasattr(book, '__dict__')
+    with pytest.raises(AttributeError):
+        book.isbn = '978'
+    assert book._to_dict() == {field: None for field in record_class._fields} | {'title': 'Dune', 'pages': 412}
+
+
+def test_records_from_a_frame_match_its_rows(library):
+    Author, Book = library.models.Author, library.models.Book
+    df = library.query('Book')
+    records = list(Book._from_df(df))
+    assert [record._to_dict() for record in records] == df.to_dict('records')
+    assert type(records[0].pages) is int
+
+    assert [record._to_dict() for record in Author._from_df(df[['pk']])] == [
+        {'name': None, 'pk': pk} for pk in df.pk]
+    assert list(Book._from_df(df.iloc[0:0])) == []
+    assert [record.title for record in library.records('Book', pages__gt=350)] == ['The Silmarillion', 'Dune']
+
+
+def test_get_and_hydrate_return_records(library):
+    Author, Book = library.models.Author, library.models.Book
+    dune = library.get('Book', title='Dune')
+    assert type(dune) is Book._record_class()
+    assert library.get('Book', dune.pk)._to_dict() == dune._to_dict() == library.query(
+        'Book', title='Dune').iloc[0].to_dict()
+    assert library.get('Book', 'missing') is None
+    assert library.get('Book', title='Emma') is None
+
+    hydrated = list(library.hydrate('Book', title__in=['Dune', 'The Hobbit']))
+    assert [type(record) for record in hydrated] == [Book._record_class()] * 2
+    assert [record.author.name for record in hydrated] == ['Tolkien', 'Herbert']
+    assert type(hydrated[0].author) is Author._record_class()
+    pd.testing.assert_frame_equal(hydrated[1].author._to_df(), library.query('Author', name='Herbert').reset_index(
+        drop=True), check_like=True)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+import pytest
+
+from pandas_db.utils import AsyncClient, Server
+from pandas_db.utils.server import on_log
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('localhost', 0))
+        return probe.getsockname()[1]
+
+
+def test_tcp_needs_a_token(library):
+    with pytest.raises(AssertionError, match='token'):
+        Server(library, port=free_port())
+
+
+def test_tcp_token_and_file_paths(library, tmp_path):
+    port = free_port()
+    server = Server(library, port=port, token='secret')
+
+    async def requests():
+        serving = asyncio.ensure_future(server.serve())
+        try:
+            for _ in range(50):
+                try:
+                    client = await AsyncClient.open(port=port, token='secret')
+                    break
+                except ConnectionRefusedError:
+                    await asyncio.sleep(0.05)
+
+            with pytest.raises(AssertionError, match='refused the token'):
+                await AsyncClient.open(port=port, token='guess')
+
+            assert (await client.query('Book')).shape[0] == 3
+            assert await client.export('Book', 'books.csv') == 3
+            assert os.path.isfile(tmp_path / 'books.csv')
+            with pytest.raises(AssertionError, match='outside of the database folder'):
+                await client.export('Book', str(tmp_path.parent / 'books.csv'))
+            with pytest.raises(AssertionError, match='outside of the database folder'):
+                await client.import_file('Book', '../books.csv')
+            await client.close()
+        finally:
+            os.kill(os.getpid(), signal.SIGTERM)
+            await serving
+
+    asyncio.run(requests())
+
+
+def test_unix_socket_round_trip(library, tmp_path):
+    path = str(tmp_path / 'db.sock')
+    server = Server(library, path=path)
+
+    async def requests():
+        serving = asyncio.ensure_future(server.serve())
+        try:
+            for _ in range(50):
+                try:
+                    client = await AsyncClient.open(path=path, models=library.models)
+                    break
+                except (ConnectionRefusedError, FileNotFoundError):
+                    await asyncio.sleep(0.05)
+
+            assert os.stat(path).st_mode & 0o777 == 0o600
+            book = await client.create('Book', title='Emma', pages=474, rating=4.0, tags=['classic'])
+            assert (await client.get('Book', book.pk)).title == 'Emma'
+            assert (await client.query('Book')).shape[0] == 4
+            await client.close()
+        finally:
+            os.kill(os.getpid(), signal.SIGTERM)
+            await serving
+
+    asyncio.run(requests())
+    assert not os.path.exists(path)
+    assert library.query('Book', title='Emma').shape[0] == 1
+
+
+def test_failures_are_logged(library, caplog):
+    server = Server(library, path='unused.sock')
+    on_log(sv=server, status='ok', data={'op': 'query'})
+    on_log(sv=server, status='error', data='auth', error='Invalid token')
+    assert [(record.levelname, record.getMessage()) for record in caplog.records] == [
+        ('WARNING', '[error] auth Invalid token')]
+
+    server.debug = True
+    with caplog.at_level(logging.DEBUG, logger='pandas_db.utils.server'):
+        on_log(sv=server, status='ok', data={'op': 'query'})
+    assert caplog.records[-1].getMessage() == "[ok] {'op': 'query'}"
@@ -0,0 +1,30 @@
+QUERIES = [
+    {'pages__gt': 300},
+    {'pages__le': 120},
+    {'pages__eq': 200},
+    {'pages__max': True},
+    {'rating__min': True},
+    {'rating__lt': 2.5, 'pages__max': True},
+    {'rating__ge': 4.0, 'pages__lt': 400},
+]
+
+
+def test_sorted_index_matches_a_scan(shelf, assert_matches_scan, change_books):
+    shelf.create_index('Book', 'pages', 'sorted')
+    shelf.create_index('Book', 'rating', 'sorted')
+    assert_matches_scan(shelf, QUERIES)
+    assert {('pages', 'sorted'), ('rating', 'sorted')} <= set(shelf._indexes['Book'])
+
+    change_books(shelf)
+    assert_matches_scan(shelf, QUERIES)
+
+
+def test_sort_and_limit_read_the_index(shelf, change_books):
+    shelf.create_index('Book', 'rating', 'sorted')
+    change_books(shelf)
+    df = shelf.query('Book')
+    for sort in ('rating', '-rating'):
+        expected = df.sort_values('rating', ascending=sort == 'rating', kind='stable').rating.head(10).tolist()
+        assert shelf.query('Book', _sort=sort, _limit=10).rating.tolist() == expected
+        assert shelf.query('Book', _sort=sort).rating.tolist() == df.sort_values(
+            'rating', ascending=sort == 'rating').rating.tolist()
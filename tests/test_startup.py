@@ -0,0 +1,53 @@
+import builtins
+import os
+from collections import Counter
+
+import pytest
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    '''
+    Counts the files opened by name from here on.
+    '''
+    opened = Counter()
+    original_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        opened_file = original_open(file, *args, **kwargs)
+        if isinstance(file, (str, os.PathLike)):
+            opened[os.path.basename(file)] += 1
+        return opened_file
+
+    monkeypatch.setattr(builtins, 'open', counting_open)
+    return opened
+
+
+@pytest.mark.parametrize('load_cache', [False, True])
+def test_tables_are_read_once_when_first_used(library, make_db, opened, load_cache):
+    db = make_db(load_cache=load_cache)
+    assert opened['Book.json'] == opened['Author.json'] == 0
+
+    assert db.query('Book').shape[0] == 3
+    assert db.Book.shape[0] == 3
+    assert opened['Book.json'] == 1
+    assert opened['Author.json'] == 0
+
+
+def test_projection_reads_only_the_needed_columns(make_db, monkeypatch):
+    db = make_db(storage='npz')
+    db.create('Book', title='Dune', pages=412, rating=4.6, tags=['scifi'])
+    db.save()
+
+    db = make_db(storage='npz')
+    read = db.storage.read
+    columns_read = []
+
+    def recording_read(path, model_name, datatypes, columns=None):
+        columns_read.append(columns)
+        return read(path, model_name, datatypes, columns=columns)
+    monkeypatch.setattr(db.storage, 'read', recording_read)
+
+    assert db.query('Book', _fields=['title'], pages__gt=400).title.tolist() == ['Dune']
+    assert sorted(columns_read[0]) == ['pages', 'pk', 'title']
+    assert 'Book' in db._unloaded
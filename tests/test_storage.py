@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+
+def table(db, model_name: str) -> pd.DataFrame:
+    return db.query(model_name).sort_values('pk').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('journal', [False, True])
+@pytest.mark.parametrize('storage', ['json', 'npz', 'parquet'])
+def test_round_trip(make_db, storage, journal):
+    db = make_db(storage=storage, journal=journal)
+    tolkien = db.create('Author', name='Tolkien')
+    db.create('Book', title='The Hobbit', author=tolkien.pk, pages=310, rating=4.3, tags=['fantasy'])
+    db.create('Book', title='Dune', pages=412, rating=4.6, tags=[])
+    db.bulk_create('Book', [{'title': f'Book {number}', 'pages': number, 'rating': number / 10, 'tags': ['a', 'b']}
+                            for number in range(20)])
+    db.save()
+    db.update('Book', db.query('Book', title='Dune'), pages=500, tags=['scifi'])
+    db.drop('Book', db.query('Book', pages__lt=5))
+    db.create('Author', name='Herbert')
+    db.save()
+
+    reopened = make_db(storage=storage, journal=journal)
+    assert reopened.storage.name == db.storage.name
+    for model_name in ('Author', 'Book'):
+        pd.testing.assert_frame_equal(table(reopened, model_name), table(db, model_name), check_like=True)
+    assert reopened.query('Book', title='Dune').tags.iloc[0] == ['scifi']
+
+    if journal:
+        reopened.compact()
+        pd.testing.assert_frame_equal(
+            table(make_db(storage=storage, journal=journal), 'Book'), table(db, 'Book'), check_like=True)
+
+
+@pytest.mark.parametrize('source, target', [('json', 'npz'), ('npz', 'parquet'), ('parquet', 'json')])
+def test_convert(make_db, source, target):
+    db = make_db(storage=source)
+    db.create('Book', title='Dune', pages=412, rating=4.6, tags=['scifi', 'classic'])
+    db.save()
+    expected = table(db, 'Book')
+
+    db.convert(target)
+    reopened = make_db()
+    assert reopened.storage.name == db.storage.name
+    pd.testing.assert_frame_equal(table(reopened, 'Book'), expected, check_like=True)
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_stream_create_writes_the_table_once(make_db, monkeypatch, journal):
+    db = make_db(journal=journal)
+    writes = []
+    write = db.storage.write
+    monkeypatch.setattr(db.storage, 'write', lambda path, model_name, *args, **kwargs: (
+        writes.append(model_name), write(path, model_name, *args, **kwargs)))
+
+    authors = ({'name': f'Author {number}'} for number in range(25))
+    assert db.stream_create('Author', authors, chunk_size=10) == 25
+    assert writes.count('Author') == 1
+    assert make_db(journal=journal).query('Author').shape[0] == 25
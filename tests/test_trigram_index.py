@@ -0,0 +1,54 @@
+import numpy as np
+
+from pandas_db.utils import required_literals, TrigramIndex
+from pandas_db.utils import trigram_index
+
+QUERIES = [
+    {'title__f': 'drag'},
+    {'title__f': 'ra'},
+    {'title__f': 'moon river'},
+    {'title__re': 'dragon|moon'},
+    {'title__re': '^(?i:dragon) '},
+    {'title__re': 'ring [0-9]+$'},
+    {'title__re': 'sea', 'rating__ge': 4.0},
+]
+
+
+def test_trigram_index_matches_a_scan(shelf, assert_matches_scan, change_books):
+    shelf.create_index('Book', 'title', 'trigram')
+    assert_matches_scan(shelf, QUERIES)
+    assert ('title', 'trigram') in shelf._indexes['Book']
+
+    change_books(shelf)
+    assert_matches_scan(shelf, QUERIES)
+
+
+def test_changes_are_merged_into_the_postings(shelf, assert_matches_scan, change_books, monkeypatch):
+    monkeypatch.setattr(trigram_index, 'MERGE_SIZE', 8)
+    shelf.create_index('Book', 'title', 'trigram')
+    change_books(shelf)
+    assert_matches_scan(shelf, QUERIES)
+
+    index = shelf._indexes['Book'][('title', 'trigram')]
+    # Without merging every update and create would have added a document.
+    assert len(index.pks) < 300 + 40 + 49
+    assert len(index.pks) - index.merged + len(index.dead) <= len(index.ids) // 8
+
+    index.merge()
+    rebuilt = TrigramIndex.build(index.pks, shelf.Book.set_index('pk').title.loc[index.pks])
+    for attribute in ('codes', 'offsets', 'documents'):
+        np.testing.assert_array_equal(getattr(index, attribute), getattr(rebuilt, attribute))
+    assert_matches_scan(shelf, QUERIES)
+
+
+def test_required_literals():
+    assert required_literals('moon river') == ('moon river',)
+    assert required_literals('dragon|moon') == ()
+    assert required_literals('The (?i:hobbit) again') == ('The ', ' again')
+    assert required_literals('(?i)hobbit') == ()
+
+
+def test_regex_with_inline_ignorecase_group(library):
+    library.create_index('Book', 'title', 'trigram')
+    assert library.query('Book', title__re='(?i:the hobbit)').title.tolist() == ['The Hobbit']
+    assert library.query('Book', title__re='The (?i:SILMARILLION)').title.tolist() == ['The Silmarillion']
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+
+def test_invalid_rows_are_reported_by_position(library):
+    df = pd.DataFrame([
+        {'title': 'Emma', 'author': None, 'pages': 474, 'rating': 4.0, 'tags': ['classic']},
+        {'title': None, 'author': 'a1', 'pages': '300', 'rating': 4.0, 'tags': 'classic'},
+        {'title': 'Ulysses', 'author': 7, 'pages': None, 'rating': 3.7, 'tags': ['classic', 2]},
+        {'title': 9, 'author': 'a2', 'pages': 265, 'rating': 4.1, 'tags': []},
+    ])
+    report = library.validate('Book', df)
+    assert not report.ok
+    assert {field: positions.tolist() for field, (_, positions) in report.errors.items()} == {
+        'title': [1, 3], 'author': [2], 'pages': [1, 2], 'tags': [1, 2]}
+    assert 'Field(pages)' in str(report)
+
+    with pytest.raises(AssertionError, match='Book validation failed'):
+        library.bulk_create('Book', df)
+    assert library.Book.shape[0] == 3
+
+
+def test_typed_columns_are_checked_by_dtype(library):
+    assert library.validate('Book').ok
+
+    df = library.Book.copy()
+    df['pages'] = df.pages.astype(float)
+    df['rating'] = df.rating.astype(int)
+    report = library.validate('Book', df)
+    assert report.errors['pages'][1].tolist() == [0, 1, 2]
+    assert report.errors['rating'][1].tolist() == [0, 1, 2]
+    assert set(report.errors) == {'pages', 'rating'}
@@ -0,0 +1,22 @@
+from pandas_db.utils import WordIndex
+
+QUERIES = [
+    {'title__search': 'dragon'},
+    {'title__search': 'king'},
+    {'title__f': 'drag'},
+    {'title__f': 'moon river'},
+    {'title__f': 'ra'},
+    {'title__f': 'star', 'pages__ge': 100},
+]
+
+
+def test_word_index_matches_a_scan(shelf, assert_matches_scan, change_books):
+    shelf.create_index('Book', 'title', 'word')
+    assert_matches_scan(shelf, QUERIES)
+    assert ('title', 'word') in shelf._indexes['Book']
+
+    change_books(shelf)
+    assert_matches_scan(shelf, QUERIES)
+    rebuilt = WordIndex.build(shelf.Book.pk, shelf.Book.title)
+    assert shelf._indexes['Book'][('title', 'word')].vocabulary == rebuilt.vocabulary
+